@@ -1,6 +1,8 @@
 import asyncio
 from typing import List, Dict, Any, Callable
 import re
+import time
+from collections import deque
 
 
 resources = {
@@ -12,6 +14,11 @@ class executor:
         # actuator
         self.sessions: Dict[str, Any] = {}
         self.providers = constants.get('providers', [])
+        # Statistiche per provider: latenza media esponenziale, campioni recenti ed esiti
+        self.statistics: Dict[str, Dict[str, Any]] = {}
+        self.alpha = constants.get('alpha', 0.2)
+        # Soglia di hedging (ms) usata finché un provider non ha campioni di latenza
+        self.hedge = constants.get('hedge', 50)
         #print('EXE-',self.providers)
         #asyncio.create_task(self.action(case="github.invite-collaborator"))
     
@@ -126,22 +133,113 @@ class executor:
 
         return {"state": True, "result": results, "error": None}
 
+    def statistic(self, name):
+        if name not in self.statistics:
+            self.statistics[name] = {'ewma': None, 'samples': deque(maxlen=100), 'calls': 0, 'failures': 0}
+        return self.statistics[name]
+
+    def record(self, name, elapsed, success, cancelled=False):
+        """
+        Aggiorna latenza (EWMA e campioni per il p95) e tasso di errore del provider.
+        Per una chiamata cancellata il tempo trascorso è un limite inferiore: conta come campione, non come chiamata.
+        """
+        statistic = self.statistic(name)
+        if not cancelled:
+            statistic['calls'] += 1
+        if not success:
+            statistic['failures'] += 1
+            return
+        statistic['samples'].append(elapsed)
+        ewma = statistic['ewma']
+        statistic['ewma'] = elapsed if ewma is None else self.alpha * elapsed + (1 - self.alpha) * ewma
+
+    def p95(self, name):
+        samples = sorted(self.statistic(name)['samples'])
+        if not samples:
+            return self.hedge
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def order(self, policy, operations):
+        """Ordina le operazioni candidate secondo la policy del repository."""
+        def failure(operation):
+            statistic = self.statistic(operation['name'])
+            return statistic['failures'] / statistic['calls'] if statistic['calls'] else 0
+
+        def latency(operation):
+            ewma = self.statistic(operation['name'])['ewma']
+            # Senza storico il provider viene provato per primo, così da raccogliere campioni
+            return 0 if ewma is None else ewma * (1 + failure(operation))
+
+        if policy == 'fastest':
+            return sorted(operations, key=latency)
+        if policy == 'cheapest':
+            return sorted(operations, key=lambda operation: (operation.get('cost', 0), failure(operation)))
+        return sorted(operations, key=lambda operation: operation.get('priority', 0))
+
+    async def timed(self, operation):
+        start = time.perf_counter()
+        try:
+            transaction = await operation['call']()
+        except asyncio.CancelledError:
+            # Un perdente cancellato non è un errore del provider, ma era almeno così lento
+            self.record(operation['name'], (time.perf_counter() - start) * 1000, True, cancelled=True)
+            raise
+        except Exception:
+            self.record(operation['name'], (time.perf_counter() - start) * 1000, False)
+            raise
+        success = bool(transaction) and not (isinstance(transaction, dict) and transaction.get('state') is False)
+        self.record(operation['name'], (time.perf_counter() - start) * 1000, success)
+        return transaction
+
+    def launch(self, operation):
+        task = asyncio.create_task(self.timed(operation), name=operation['name'])
+        task.parameters = operation.get('parameters', {})
+        return task
+
     @flow.asynchronous(managers=('messenger',))
     async def first_completed(self, messenger, **constants):
-        """Attende il primo task completato e restituisce il suo risultato."""
+        """
+        Attende il primo task completato e restituisce il suo risultato.
+        Le operazioni possono essere task già avviati oppure operazioni da avviare
+        ({'name','call','parameters','cost','priority'}) secondo la policy:
+        all (tutte insieme), primary, hedged, fastest, cheapest.
+        """
         operations = constants.get('operations', [])
+        policy = constants.get('policy', 'all')
         await messenger.post(domain='debug',message="⏳ Attesa della prima operazione completata...")
 
+        pending = [operation for operation in operations if isinstance(operation, dict)]
+        operations = {operation for operation in operations if not isinstance(operation, dict)}
+        if policy == 'all':
+            operations |= {self.launch(operation) for operation in pending}
+            pending = []
+        else:
+            pending = self.order(policy, pending)
+        if not operations and pending:
+            operations.add(self.launch(pending.pop(0)))
+        # Ultima transazione con state False: restituita solo se nessun'altra operazione riesce
+        failed = None
+
         try:
             while operations:
-                finished, unfinished = await asyncio.wait(operations, return_when=asyncio.FIRST_COMPLETED)
+                # Con hedged si avvia il successivo se il primo supera il suo p95
+                timeout = None
+                if policy == 'hedged' and pending:
+                    timeout = max(self.p95(name) for name in [task.get_name() for task in operations]) / 1000
+                finished, unfinished = await asyncio.wait(operations, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not finished and pending:
+                    await messenger.post(domain='debug',message=f"🪁 Hedging: avvio di {pending[0]['name']}")
+                    unfinished.add(self.launch(pending.pop(0)))
 
                 for operation in finished:
                     try:
                         transaction = operation.result()
-                        print(transaction,'<------------------')
-                        if transaction:
-                            print(f"Transazione completata: {type(transaction)}")
+                        if isinstance(transaction, dict) and transaction.get('state') is False:
+                            # Come un'eccezione: si registra e si passa al failover
+                            failed = transaction | {'parameters': getattr(operation, 'parameters', {})}
+                            await messenger.post(domain='debug',message=f"❌ Operazione fallita: {transaction.get('error')}")
+                        elif transaction:
                             if 'success' in constants:
                                 transaction = await constants['success'](transaction=transaction,profile=operation.get_name())
                             await messenger.post(domain='debug',message=f"✅ Transazione completata: {str(transaction)}")
@@ -152,11 +250,14 @@ class executor:
                     except Exception as e:
                         await messenger.post(domain='debug',message=f"❌ Errore nell'operazione: {e}")
 
+                # Failover: se nessuna operazione è ancora attiva si passa alla successiva
+                if finished and not unfinished and pending:
+                    unfinished.add(self.launch(pending.pop(0)))
                 operations = unfinished
 
             error_msg = "⚠️ Nessuna transazione valida completata"
             await messenger.post(domain='debug',message=error_msg)
-            return {"state": False, "result": None, "error": error_msg}
+            return failed or {"state": False, "result": None, "error": error_msg}
 
         except Exception as e:
             error_msg = f"❌ Errore in first_completed: {str(e)}"
@@ -0,0 +1,29 @@
+resources = {
+    'executor': 'framework/manager/executor.py',
+    'test': 'framework/service/test.py',
+}
+
+class TestModule(test.test):
+
+    async def test_executor(self):
+        """Verifica il failover di first_completed quando il primario risponde con state False."""
+        async def primary():
+            return {'state': False, 'result': None, 'error': 'primario non disponibile'}
+
+        async def secondary():
+            return {'state': True, 'result': 'secondario', 'error': None}
+
+        def operation(name, call, priority):
+            return {'name': name, 'call': call, 'priority': priority, 'parameters': {'provider': name}}
+
+        async def first_completed(*operations):
+            transaction = await executor.executor().first_completed(operations=list(operations), policy='primary')
+            return (transaction['state'], transaction['result'], transaction['parameters'])
+
+        success = [
+            {'args':(operation('primary', primary, 0), operation('secondary', secondary, 1)),'equal':(True, 'secondario', {'provider': 'secondary'})},
+            {'args':(operation('primary', secondary, 0), operation('secondary', primary, 1)),'equal':(True, 'secondario', {'provider': 'primary'})},
+            {'args':(operation('primary', primary, 0), operation('secondary', primary, 1)),'equal':(False, None, {'provider': 'secondary'})},
+        ]
+
+        await self.check_cases(first_completed, success)
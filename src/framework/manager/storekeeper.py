@@ -1,14 +1,366 @@
 import asyncio
 import importlib
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
 
 resources = {
     'flow': 'framework/service/flow.py',
+    'persistence': 'framework/port/persistence.py',
 }
 
+class batch():
+    """
+    DataLoader con scope di richiesta: raccoglie le gather emesse nello stesso tick di render,
+    unisce le richieste identiche e fonde i filtri 'eq'/'in' compatibili in una sola query per repository.
+    """
+
+    def __init__(self, storekeeper):
+        self.storekeeper = storekeeper
+        self.futures = {}
+        self.pending = []
+        self.dispatcher = None
+
+    @staticmethod
+    def key(repository, filter, payload):
+        return (repository, json.dumps(filter, sort_keys=True, default=str), json.dumps(payload, sort_keys=True, default=str))
+
+    @staticmethod
+    def signature(filter):
+        """Restituisce (campo, valori, resto) se il filtro è fondibile, altrimenti None."""
+        if 'pagination' in filter:
+            return None
+        fields = {}
+        for op in ('eq', 'in'):
+            for field, value in filter.get(op, {}).items():
+                values = value if isinstance(value, (list, tuple)) else [value]
+                fields.setdefault(field, []).extend(values)
+        if len(fields) != 1:
+            return None
+        field, values = next(iter(fields.items()))
+        rest = {op: params for op, params in filter.items() if op not in ('eq', 'in')}
+        return field, values, json.dumps(rest, sort_keys=True, default=str)
+
+    async def load(self, **constants):
+        repository = constants.get('repository', '')
+        filter = constants.get('filter', {}) or {}
+        payload = constants.get('payload', {}) or {}
+        key = self.key(repository, filter, payload)
+
+        # Richieste identiche nella stessa richiesta condividono lo stesso future
+        if key not in self.futures:
+            self.futures[key] = asyncio.get_running_loop().create_future()
+            self.pending.append((key, repository, filter, payload))
+            if self.dispatcher is None:
+                self.dispatcher = asyncio.create_task(self.dispatch())
+        return await asyncio.shield(self.futures[key])
+
+    async def dispatch(self):
+        # Lascia completare il tick corrente di render prima di svuotare la coda
+        await asyncio.sleep(0)
+        pending, self.pending, self.dispatcher = self.pending, [], None
+
+        groups = {}
+        for request in pending:
+            key, repository, filter, payload = request
+            signature = self.signature(filter)
+            if signature:
+                group = (repository, key[2], signature[0], signature[2])
+            else:
+                group = key
+            groups.setdefault(group, []).append(request)
+
+        await asyncio.gather(*[self.resolve(requests) for requests in groups.values()])
+
+    async def resolve(self, requests):
+        if len(requests) == 1:
+            return await self.single(requests[0])
+
+        _, repository, filter, payload = requests[0]
+        field, _, _ = self.signature(filter)
+        values = []
+        for request in requests:
+            for value in self.signature(request[2])[1]:
+                if value not in values:
+                    values.append(value)
+        merged = {op: params for op, params in filter.items() if op not in ('eq', 'in')} | {'in': {field: values}}
+
+        try:
+            transaction = await self.storekeeper.gather(repository=repository, filter=merged, payload=payload)
+        except Exception as e:
+            # Nessun future deve restare in sospeso: l'errore si propaga a tutte le richieste del gruppo
+            for request in requests:
+                if not self.futures[request[0]].done():
+                    self.futures[request[0]].set_exception(e)
+            return
+        rows = (transaction or {}).get('result')
+        if not isinstance(rows, list) or any(not isinstance(row, dict) or field not in row for row in rows):
+            # Il campo filtrato non è presente nei risultati tradotti: non si può smistare, si procede singolarmente
+            return await asyncio.gather(*[self.single(request) for request in requests])
+
+        for request in requests:
+            wanted = {str(value) for value in self.signature(request[2])[1]}
+            result = [row for row in rows if str(row.get(field)) in wanted]
+            self.futures[request[0]].set_result(transaction | {'result': result})
+
+    async def single(self, request):
+        key, repository, filter, payload = request
+        try:
+            transaction = await self.storekeeper.gather(repository=repository, filter=filter, payload=payload)
+            self.futures[key].set_result(transaction)
+        except Exception as e:
+            self.futures[key].set_exception(e)
+
+class cache():
+    """
+    Cache read-through delle letture: LRU in processo (L1) e, opzionale, Redis (L2)
+    riusando la connessione del provider redis marcato con 'cache' nella configurazione.
+    Le scritture su un repository invalidano le sue voci: L1 per indice, L2 cambiando generazione.
+    """
+
+    def __init__(self, providers, limit=1024):
+        self.providers = providers
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.index = {}
+        # Epoca locale per repository: incrementata a ogni invalidazione
+        self.epochs = {}
+
+    @staticmethod
+    def key(repository, operation, constants):
+        normalized = json.dumps({'filter': constants.get('filter', {}) or {}, 'payload': constants.get('payload', {}) or {}}, sort_keys=True, default=str)
+        return f"{repository}:{operation}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+    @property
+    def redis(self):
+        for provider in self.providers:
+            config = getattr(provider, 'config', {})
+            if config.get('cache') and getattr(provider, 'conn', None) is not None:
+                return provider.conn
+        return None
+
+    async def generation(self, conn, repository):
+        value = await conn.get(f"storekeeper:{repository}:generation")
+        return int(value or 0)
+
+    async def epoch(self, repository):
+        """Epoca corrente del repository (locale e generazione L2): cambia a ogni invalidazione."""
+        generation = None
+        conn = self.redis
+        if conn is not None:
+            try:
+                generation = await self.generation(conn, repository)
+            except Exception as e:
+                print(f"Errore nella lettura della generazione L2: {e}")
+        return (self.epochs.get(repository, 0), generation)
+
+    async def get(self, repository, key):
+        entry = self.entries.get(key)
+        if entry:
+            if entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                return copy.deepcopy(entry[1])
+            self.discard(key)
+
+        conn = self.redis
+        if conn is None:
+            return None
+        try:
+            generation = await self.generation(conn, repository)
+            value = await conn.get(f"storekeeper:{key}:{generation}")
+            if value is None:
+                return None
+            ttl = await conn.ttl(f"storekeeper:{key}:{generation}")
+            transaction = json.loads(value)
+            self.put(repository, key, transaction, max(ttl, 1))
+            return copy.deepcopy(transaction)
+        except Exception as e:
+            print(f"Errore nella lettura della cache L2: {e}")
+            return None
+
+    async def set(self, repository, key, transaction, ttl, epoch=None):
+        """
+        Memorizza la transazione; con 'epoch' (letta prima di interrogare i provider)
+        la scrittura è scartata se nel frattempo il repository è stato invalidato.
+        """
+        if epoch is not None and await self.epoch(repository) != epoch:
+            return
+        self.put(repository, key, copy.deepcopy(transaction), ttl)
+        conn = self.redis
+        if conn is None:
+            return
+        try:
+            generation = epoch[1] if epoch is not None and epoch[1] is not None else await self.generation(conn, repository)
+            await conn.set(f"storekeeper:{key}:{generation}", json.dumps(transaction, default=str), ex=max(int(ttl), 1))
+        except Exception as e:
+            print(f"Errore nella scrittura della cache L2: {e}")
+
+    def put(self, repository, key, transaction, ttl):
+        self.entries[key] = (time.monotonic() + ttl, transaction)
+        self.entries.move_to_end(key)
+        self.index.setdefault(repository, set()).add(key)
+        while len(self.entries) > self.limit:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+        keys = self.index.get(key.split(':', 1)[0])
+        if keys:
+            keys.discard(key)
+
+    async def invalidate(self, repository):
+        self.epochs[repository] = self.epochs.get(repository, 0) + 1
+        for key in self.index.pop(repository, set()):
+            self.entries.pop(key, None)
+        conn = self.redis
+        if conn is None:
+            return
+        try:
+            # Le voci della generazione precedente non sono più raggiungibili e scadono col loro TTL
+            await conn.incr(f"storekeeper:{repository}:generation")
+        except Exception as e:
+            print(f"Errore nell'invalidazione della cache L2: {e}")
+
+class coalescer():
+    """
+    Micro-batching delle scritture: gli elementi accodati per (repository, operazione)
+    entro la finestra del repository partono insieme in un'unica storekeeper.batch.
+    """
+
+    def __init__(self, storekeeper):
+        self.storekeeper = storekeeper
+        self.queues = {}
+
+    async def enqueue(self, operation, window, size, **constants):
+        group = (constants.get('repository', ''), operation)
+        queue = self.queues.get(group)
+        if queue is None:
+            queue = self.queues[group] = {'items': [], 'futures': [], 'timer': None}
+            queue['timer'] = asyncio.get_running_loop().call_later(window, lambda: asyncio.ensure_future(self.flush(group)))
+        future = asyncio.get_running_loop().create_future()
+        queue['items'].append(constants)
+        queue['futures'].append(future)
+        if len(queue['items']) >= size:
+            queue['timer'].cancel()
+            asyncio.ensure_future(self.flush(group))
+        return await future
+
+    async def flush(self, group):
+        queue = self.queues.pop(group, None)
+        if queue is None:
+            return
+        repository, operation = group
+        try:
+            transaction = await self.storekeeper.batch(repository=repository, operation=operation, items=queue['items'])
+            results = (transaction or {}).get('result') or []
+        except Exception as e:
+            results = []
+            print(f"Errore nel micro-batch di '{repository}': {e}")
+        for index, future in enumerate(queue['futures']):
+            if not future.done():
+                future.set_result(results[index] if index < len(results) else {"state": False, "result": None, "error": "batch fallito"})
+
 class storekeeper():
 
     def __init__(self,**constants):
         self.providers = constants['providers']
+        self.scope = contextvars.ContextVar('storekeeper.batch', default=None)
+        self.cache = cache(self.providers, constants.get('cache', 1024))
+        self.coalescer = coalescer(self)
+        # Cache dei moduli repository: nome -> {'version': mtime del file, 'repository': oggetto}
+        self.repositories = {}
+        self.loading = {}
+        # Riferimento al task di precaricamento: evita che venga raccolto a metà e ne riporta gli errori
+        self.warming = None
+        try:
+            self.warming = asyncio.get_running_loop().create_task(self.warm())
+            self.warming.add_done_callback(self.warmed)
+        except RuntimeError:
+            pass
+
+    def warmed(self, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            print(f"Errore durante il precaricamento dei repository: {error}")
+
+    def version(self, name):
+        """mtime del modulo repository, None se il file non è raggiungibile."""
+        try:
+            return os.stat(f"src/application/repository/{name}.py").st_mtime_ns
+        except OSError:
+            return None
+
+    async def repository(self, name):
+        """
+        Restituisce il repository dalla cache, caricandolo una sola volta anche con richieste concorrenti;
+        se il file è cambiato rispetto alla versione in cache viene ricaricato.
+        """
+        cached = self.repositories.get(name)
+        if cached:
+            if cached['version'] == self.version(name):
+                return cached['repository']
+            self.repositories.pop(name, None)
+
+        task = self.loading.get(name)
+        if task is None:
+            task = self.loading[name] = asyncio.create_task(self.import_repository(name))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.loading.pop(name, None)
+
+    async def import_repository(self, name):
+        path = f"application/repository/{name}.py"
+        version = self.version(name)
+        repository_module = await language.resource(language, path=path)
+        self.repositories[name] = {'version': version, 'repository': repository_module.repository}
+        return repository_module.repository
+
+    async def warm(self, **constants):
+        """
+        Precarica tutti i repository di application/repository e ricarica quelli
+        il cui file è cambiato rispetto alla versione in cache.
+        """
+        folder = 'src/application/repository'
+        if not os.path.isdir(folder):
+            return []
+        names = []
+        for entry in os.scandir(folder):
+            if not entry.name.endswith('.py') or entry.name.endswith('.test.py'):
+                continue
+            name = entry.name[:-3]
+            cached = self.repositories.get(name)
+            if cached and cached['version'] == entry.stat().st_mtime_ns:
+                continue
+            self.repositories.pop(name, None)
+            names.append(name)
+
+        results = await asyncio.gather(*[self.repository(name) for name in names], return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"Errore durante il precaricamento del repository '{name}': {result}")
+        return names
+
+    def open(self):
+        """Apre un batch per la richiesta corrente; i task figli ereditano il contesto."""
+        return self.scope.set(batch(self))
+
+    def close(self, token):
+        self.scope.reset(token)
+
+    async def load(self, **constants):
+        """Come gather, ma passa dal batch della richiesta corrente se presente."""
+        current = self.scope.get()
+        if current is None:
+            return await self.gather(**constants)
+        return await current.load(**constants)
 
     async def preparation(self, **constants):
         operations = []
@@ -16,11 +368,7 @@ class storekeeper():
         repository_name = constants.get('repository', '')
 
         try:
-            repository_module = await language.resource(
-                language,
-                path=f"application/repository/{repository_name}.py"
-            )
-            repository = repository_module.repository
+            repository = await self.repository(repository_name)
         except Exception as e:
             print(f"Errore durante il caricamento del modulo repository '{repository_name}': {e}")
             return None, []
@@ -38,6 +386,14 @@ class storekeeper():
                 if profile in repository.location:
                     try:
                         task_args = await repository.parameters(operation, profile, **constants)
+                        if operation == 'aggregate':
+                            # I campi del modello diventano le colonne del provider
+                            task_args['functions'] = {function: [self.column(repository, profile, field) for field in fields] for function, fields in constants.get('functions', {}).items()}
+                            task_args['group_by'] = [self.column(repository, profile, field) for field in constants.get('group_by', [])]
+                        if operation in ('read', 'view') and 'fields' not in task_args:
+                            fields = self.projection(repository, profile, constants.get('filter'))
+                            if fields:
+                                task_args['fields'] = fields
                     except Exception as e:
                         print(f"Errore durante l'ottenimento dei parametri per {profile}: {e}")
                         continue
@@ -48,9 +404,14 @@ class storekeeper():
                         print(f"Il metodo '{operation}' non è disponibile per il provider {profile}.")
                         continue
 
-                    task = asyncio.create_task(method(**task_args), name=profile)
-                    task.parameters = task_args
-                    operations.append(task)
+                    # L'avvio è rimandato all'executor, che decide quando e su quali provider secondo la policy
+                    operations.append({
+                        'name': profile,
+                        'call': functools.partial(method, **task_args),
+                        'parameters': task_args,
+                        'cost': provider.config.get('cost', 0),
+                        'priority': provider.config.get('priority', len(operations)),
+                    })
                 else:
                     print(f"Provider {provider} non ha un profilo trovato.")
             except Exception as e:
@@ -58,32 +419,288 @@ class storekeeper():
         print(repository,operations)
         return repository, operations
     
+    @staticmethod
+    def column(repository, profile, field):
+        """Colonna del provider corrispondente a un campo del modello secondo il mapper."""
+        mapping = (getattr(repository, 'mapper', {}) or {}).get(field)
+        if isinstance(mapping, dict) and profile in mapping:
+            return mapping[profile].split('.')[0]
+        return field
+
+    @staticmethod
+    def projection(repository, profile, filter=None):
+        """
+        Campi del provider da leggere, su richiesta del repository ('fields'): una lista (o un dict per profilo)
+        di colonne, oppure True per derivarle dalle radici del mapper più i campi dello schema senza mapping.
+        Senza 'fields' si legge tutto: lo schema può contenere campi che non sono colonne del provider.
+        """
+        declared = getattr(repository, 'fields', None)
+        if isinstance(declared, dict):
+            declared = declared.get(profile)
+        if not declared:
+            return None
+
+        if declared is True:
+            mapper = getattr(repository, 'mapper', {}) or {}
+            schema = getattr(repository, 'schema', None)
+            if not isinstance(schema, dict):
+                return None
+            fields = []
+            mapped = set()
+            for key, mapping in mapper.items():
+                if isinstance(mapping, dict) and profile in mapping:
+                    mapped.add(key.split('.')[0])
+                    fields.append(mapping[profile].split('.')[0])
+            fields += [key for key in schema if key not in mapped]
+        else:
+            fields = list(declared)
+        # La chiave della paginazione keyset serve per calcolare il cursore
+        pagination = (filter or {}).get('pagination') or {}
+        if pagination.get('order_by'):
+            field, _, key, _ = persistence.keyset(pagination)
+            fields += [field, key]
+        return list(dict.fromkeys(fields))
+
+    def policy(self, repository, operation):
+        """Policy di selezione dei provider dichiarata dal repository, globale o per operazione."""
+        policy = getattr(repository, 'policy', 'all')
+        if isinstance(policy, dict):
+            return policy.get(operation, policy.get('default', 'all'))
+        return policy or 'all'
+
+    def ttl(self, repository, operation):
+        """TTL in secondi dichiarato dal repository, globale o per operazione; 0 disabilita la cache."""
+        ttl = getattr(repository, 'ttl', 0)
+        if isinstance(ttl, dict):
+            return ttl.get(operation, ttl.get('default', 0))
+        return ttl or 0
+
+    @staticmethod
+    def cursor(transaction, pagination):
+        """
+        Con la paginazione keyset espone in 'cursor' il cursore dell'ultima riga, da passare come 'after':
+        la coppia [order_by, chiave univoca], o il solo valore se order_by è la chiave stessa.
+        """
+        if not transaction or not pagination.get('order_by'):
+            return
+        rows = transaction.get('result')
+        field, _, key, _ = persistence.keyset(pagination)
+        if isinstance(rows, list) and rows and isinstance(rows[-1], dict):
+            last = rows[-1]
+            transaction['cursor'] = [last.get(field), last.get(key)] if key != field and key in last else last.get(field)
+        else:
+            transaction['cursor'] = None
+
+    async def cached(self, executor, operation, **constants):
+        """Lettura read-through: restituisce la voce in cache o interroga i provider e la memorizza."""
+        name = constants.get('repository', '')
+        try:
+            ttl = self.ttl(await self.repository(name), operation)
+        except Exception:
+            ttl = 0
+        key = self.cache.key(name, operation, constants)
+        if ttl:
+            transaction = await self.cache.get(name, key)
+            if transaction is not None:
+                return transaction
+
+        # Epoca letta prima della richiesta: una lettura in volo durante un'invalidazione non viene memorizzata
+        epoch = await self.cache.epoch(name) if ttl else None
+        repository,operations = await self.preparation(**constants|{'operation':operation})
+        transaction = await executor.first_completed(operations=operations,success=repository.results,policy=self.policy(repository,operation))
+        self.cursor(transaction, (constants.get('filter') or {}).get('pagination', {}))
+        if ttl and transaction and transaction.get('state'):
+            await self.cache.set(name, key, transaction, ttl, epoch=epoch)
+        return transaction
+
     # overview/view/get
     @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
     async def overview(self, executor, **constants):
-        repository,operations = await self.preparation(**constants|{'operation':'view'})
-        return await executor.first_completed(operations=operations,success=repository.results)
+        return await self.cached(executor, 'view', **constants)
 
     # gather/read/get
     @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
     async def gather(self, executor, **constants):
-        repository,operations = await self.preparation(**constants|{'operation':'read'})
-        return await executor.first_completed(operations=operations,success=repository.results)
+        return await self.cached(executor, 'read', **constants)
     
+    async def stream(self, **constants):
+        """
+        Itera le righe di una gather pagina per pagina: la pagina successiva viene richiesta
+        mentre la corrente è consumata, tenendo in memoria al più 'window' pagine già lette.
+        Con 'order_by' le pagine sono lette per keyset invece che per offset.
+        Un errore del produttore viene rilanciato al consumatore: uno stream troncato non sembra mai completo.
+        """
+        page_size = constants.pop('page_size', 100)
+        window = constants.pop('window', 1)
+        order_by = constants.pop('order_by', None)
+        filter = constants.pop('filter', {}) or {}
+        pages = asyncio.Queue(maxsize=window)
+
+        async def produce():
+            page = 1
+            after = None
+            try:
+                while True:
+                    # Con order_by si procede per keyset (after = cursore della pagina precedente)
+                    if order_by:
+                        pagination = {'order_by': order_by, 'end': page_size} | ({'after': after} if after is not None else {})
+                    else:
+                        pagination = {'start': page, 'end': page_size}
+                    transaction = await self.gather(**constants, filter=filter | {'pagination': pagination})
+                    rows = (transaction or {}).get('result') or []
+                    if not (transaction or {}).get('state', bool(rows)) or not isinstance(rows, list):
+                        rows = []
+                    if rows:
+                        await pages.put(rows)
+                    if len(rows) < page_size:
+                        break
+                    if order_by:
+                        after = (transaction or {}).get('cursor')
+                        if after is None:
+                            break
+                    page += 1
+            except Exception as e:
+                print(f"Errore durante lo stream di '{constants.get('repository', '')}': {e}")
+                await pages.put(e)
+                return
+            # Fine dello stream (non raggiunta se il consumatore ha già chiuso l'iteratore)
+            await pages.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (rows := await pages.get()) is not None:
+                if isinstance(rows, Exception):
+                    raise rows
+                for row in rows:
+                    yield row
+        finally:
+            producer.cancel()
+
+    async def window(self, operation, **constants):
+        """Se il repository dichiara una finestra di micro-batching la scrittura viene accodata."""
+        try:
+            repository = await self.repository(constants.get('repository', ''))
+        except Exception:
+            return None
+        window = getattr(repository, 'window', 0)
+        if not window or 'items' in constants:
+            return None
+        return await self.coalescer.enqueue(operation, window, getattr(repository, 'size', 100), **constants)
+
+    # batch/bulk write
+    @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
+    async def batch(self, executor, **constants):
+        """
+        Scrive una lista di elementi ('items', ciascuno con i propri payload/filter) con una chiamata
+        bulk per provider e location. Restituisce in 'result' una transazione per elemento, nello stesso ordine.
+        """
+        operation = constants.get('operation', 'create')
+        items = constants.get('items', [])
+        name = constants.get('repository', '')
+        common = {key: value for key, value in constants.items() if key not in ('items', 'operation')}
+        repository = await self.repository(name)
+
+        operations = []
+        for provider in self.providers:
+            profile = provider.config.get('profile', '').upper()
+            if profile not in repository.location or not callable(getattr(provider, 'batch', None)):
+                continue
+            try:
+                arguments = [await repository.parameters(operation, profile, **common | item) for item in items]
+            except Exception as e:
+                print(f"Errore durante l'ottenimento dei parametri per {profile}: {e}")
+                continue
+
+            async def call(provider=provider, arguments=arguments):
+                # Un'unica chiamata bulk per location, poi i risultati tornano nell'ordine degli elementi
+                groups = {}
+                for index, argument in enumerate(arguments):
+                    groups.setdefault(argument.get('location'), []).append(index)
+                outcomes = await asyncio.gather(*[provider.batch(operation=operation, items=[arguments[index] for index in indexes]) for indexes in groups.values()])
+                results = [None] * len(arguments)
+                for indexes, outcome in zip(groups.values(), outcomes):
+                    for index, result in zip(indexes, (outcome or {}).get('result') or []):
+                        results[index] = result
+                results = [result or {"state": False, "result": None, "error": "nessun risultato"} for result in results]
+                return {"state": any(result.get('state') for result in results), "result": results}
+
+            operations.append({
+                'name': profile,
+                'call': call,
+                'parameters': {'operation': operation, 'items': arguments},
+                'cost': provider.config.get('cost', 0),
+                'priority': provider.config.get('priority', len(operations)),
+            })
+
+        async def success(transaction, profile):
+            for index, result in enumerate(transaction['result']):
+                if result.get('state') and isinstance(result.get('result'), list):
+                    transaction['result'][index] = await repository.results(transaction=result, profile=profile)
+            return transaction
+
+        transaction = await executor.first_completed(operations=operations,success=success,policy=self.policy(repository,operation))
+        await self.cache.invalidate(name)
+        return transaction
+
+    # aggregate/count
+    @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
+    async def aggregate(self, executor, **constants):
+        """
+        Aggregazioni (count, sum, min, max) con 'group_by' opzionale sui campi del modello.
+        I provider con supporto nativo le calcolano lato server; altrimenti si aggrega in memoria sulle righe lette.
+        """
+        functions = constants.get('functions') or {'count': ['*']}
+        group_by = constants.get('group_by', [])
+        constants = constants | {'functions': functions, 'group_by': group_by}
+        repository,operations = await self.preparation(**constants|{'operation':'aggregate'})
+
+        async def success(transaction, profile):
+            # Rinomina colonne e risultati del provider con i nomi del modello
+            names = {}
+            for field in group_by:
+                names[self.column(repository, profile, field)] = field
+            for function, fields in functions.items():
+                for field in fields:
+                    names[persistence.label(function, self.column(repository, profile, field))] = persistence.label(function, field)
+            transaction['result'] = [{names.get(key, key): value for key, value in row.items()} for row in transaction.get('result') or []]
+            return transaction
+
+        transaction = None
+        if operations:
+            transaction = await executor.first_completed(operations=operations,success=success,policy=self.policy(repository,'aggregate'))
+        if transaction and transaction.get('state'):
+            return transaction
+
+        transaction = await self.gather(**{key: value for key, value in constants.items() if key not in ('functions', 'group_by')})
+        if not transaction or not transaction.get('state'):
+            return transaction
+        rows = transaction.get('result') or []
+        return {"state": True, "result": persistence.summarize(rows if isinstance(rows, list) else [rows], functions, group_by)}
+
     # store/create/put
     @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
     async def store(self, executor, **constants):
+        if (transaction := await self.window('create', **constants)) is not None:
+            return transaction
         repository,operations = await self.preparation(**constants|{'operation':'create'})
-        return await executor.first_completed(operations=operations,success=repository.results)
+        transaction = await executor.first_completed(operations=operations,success=repository.results,policy=self.policy(repository,'create'))
+        await self.cache.invalidate(constants.get('repository', ''))
+        return transaction
     
     # remove/delete/delete
     @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
     async def remove(self, executor, **constants):
         repository,operations = await self.preparation(**constants|{'operation':'delete'})
-        return await executor.first_completed(operations=operations,success=repository.results)
+        transaction = await executor.first_completed(operations=operations,success=repository.results,policy=self.policy(repository,'delete'))
+        await self.cache.invalidate(constants.get('repository', ''))
+        return transaction
     
     # change/update/patch
     @flow.asynchronous(inputs='storekeeper',outputs='transaction',managers=('executor',))
     async def change(self,executor,**constants):
+        if (transaction := await self.window('update', **constants)) is not None:
+            return transaction
         repository,operations = await self.preparation(**constants|{'operation':'update'})
-        return await executor.first_completed(operations=operations,success=repository.results)
\ No newline at end of file
+        transaction = await executor.first_completed(operations=operations,success=repository.results,policy=self.policy(repository,'update'))
+        await self.cache.invalidate(constants.get('repository', ''))
+        return transaction
\ No newline at end of file
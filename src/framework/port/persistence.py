@@ -1,6 +1,67 @@
+import asyncio
 from abc import ABC, abstractmethod
 
+def label(function, field):
+    """Nome del risultato di un'aggregazione: 'count' per count(*), altrimenti 'funzione_campo'."""
+    return function if field in ('*', None) else f"{function}_{field}"
+
+def summarize(rows, functions, group_by=()):
+    """
+    Aggregazione in memoria (count, sum, min, max) con raggruppamento opzionale.
+    'functions' è un dict funzione -> lista di campi, es. {'count': ['*'], 'sum': ['amount']}.
+    """
+    groups = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        key = tuple(row.get(field) for field in group_by)
+        groups.setdefault(key, []).append(row)
+    if not groups and not group_by:
+        groups[()] = []
+
+    results = []
+    for key, members in groups.items():
+        result = dict(zip(group_by, key))
+        for function, fields in functions.items():
+            for field in fields:
+                if function == 'count':
+                    values = members if field in ('*', None) else [row for row in members if row.get(field) is not None]
+                    result[label(function, field)] = len(values)
+                    continue
+                values = [row.get(field) for row in members if row.get(field) is not None]
+                match function:
+                    case 'sum':
+                        result[label(function, field)] = sum(values)
+                    case 'min':
+                        result[label(function, field)] = min(values) if values else None
+                    case 'max':
+                        result[label(function, field)] = max(values) if values else None
+                    case _:
+                        raise ValueError(f"Funzione di aggregazione non supportata: {function}")
+        results.append(result)
+    return results
+
+def keyset(pagination):
+    """
+    Scompone la paginazione keyset in (campo, decrescente, chiave univoca, cursore).
+    Il cursore è la coppia (valore di order_by, valore della chiave) dell'ultima riga letta, o None;
+    un 'after' scalare vale (valore, None) ed è corretto solo se order_by è già univoco.
+    """
+    order_by = pagination.get('order_by') or 'id'
+    key = pagination.get('key') or 'id'
+    after = pagination.get('after')
+    if after is None:
+        cursor = None
+    elif isinstance(after, (list, tuple)) and len(after) == 2:
+        cursor = tuple(after)
+    else:
+        cursor = (after, None)
+    return order_by.lstrip('-'), order_by.startswith('-'), key, cursor
+
 class port(ABC):
+    # Filtro 'pagination': per offset {'start': pagina, 'end': dimensione}
+    # oppure per keyset {'order_by': campo ('-campo' decrescente), 'key': campo univoco di spareggio (default 'id'),
+    # 'after': cursore [valore di order_by, valore di key] dell'ultima riga, 'end': dimensione}
     @abstractmethod
     async def create(self,*services,**constants):
         pass
@@ -23,4 +84,25 @@ class port(ABC):
 
     @abstractmethod
     async def view(self,*services,**constants):
-        pass
\ No newline at end of file
+        pass
+
+    async def batch(self,*services,**constants):
+        """
+        Scrittura di più elementi: 'operation' ('create'/'update') e 'items' (parametri per elemento).
+        Gli adapter con API bulk la sovrascrivono; di default le chiamate partono in parallelo.
+        """
+        operation = getattr(self, constants.get('operation', 'create'))
+        outcomes = await asyncio.gather(*[operation(**item) for item in constants.get('items', [])], return_exceptions=True)
+        results = [{"state": False, "result": None, "error": str(outcome)} if isinstance(outcome, Exception) else outcome for outcome in outcomes]
+        return {"state": all(result and result.get('state') for result in results), "result": results}
+
+    async def aggregate(self,*services,**constants):
+        """
+        Aggregazione ('functions', 'group_by', 'filter'): gli adapter con supporto nativo la sovrascrivono,
+        di default si leggono le righe e si aggrega in memoria.
+        """
+        transaction = await self.read(**constants)
+        if not transaction or not transaction.get('state'):
+            return transaction
+        rows = transaction.get('result') or []
+        return {"state": True, "result": summarize(rows if isinstance(rows, list) else [rows], constants.get('functions', {}), constants.get('group_by', []))}
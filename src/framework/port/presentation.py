@@ -3,23 +3,162 @@ import xml.etree.ElementTree as ET
 from jinja2 import Environment, select_autoescape,FileSystemLoader,BaseLoader,ChoiceLoader,Template,DebugUndefined
 from html import escape
 import uuid
-import untangle
+import io
+import json
+import hashlib
+import tempfile
+import time
+import functools
+import contextvars
 import markupsafe
 import re
+import os
+import asyncio
+from collections import OrderedDict
 
-import itertools
 
 resources = {
     'flow': 'framework/service/flow.py',
     'tags': 'framework/schema/tags.json',
 }
 
+class registry(OrderedDict):
+    """
+    Registro dei componenti: indicizza all'avvio le viste in application/view/component/*.xml
+    e mantiene lo stato dei componenti montati in una struttura limitata con politica LRU.
+    """
+
+    def __init__(self, limit=1024, folder='application/view/component'):
+        super().__init__()
+        self.limit = int(limit)
+        self.folder = folder
+        self.views = {}
+        # Sorgenti XML in cache con il loro mtime: una modifica al file viene ricaricata senza riavvio
+        self.sources = {}
+
+        if os.path.isdir(f'src/{folder}'):
+            for entry in os.scandir(f'src/{folder}'):
+                if entry.is_file() and entry.name.endswith('.xml'):
+                    name = entry.name[:-4]
+                    self.views[name] = f'{folder}/{entry.name}'
+                    self.load(name, entry.path)
+
+    def load(self, tag, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, 'r', encoding='utf-8') as file:
+                self.sources[tag] = (mtime, file.read())
+        except OSError:
+            self.sources.pop(tag, None)
+
+    def view(self, tag):
+        return self.views.get(tag) or f'{self.folder}/{tag}.xml'
+
+    def source(self, tag):
+        if tag not in self.sources:
+            return None
+        mtime, text = self.sources[tag]
+        path = f'src/{self.views[tag]}'
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                self.load(tag, path)
+        except OSError:
+            self.sources.pop(tag, None)
+        return self.sources[tag][1] if tag in self.sources else None
+
+    def identifier(self, tag):
+        # Identificativi casuali: univoci anche fra riavvii e processi worker diversi
+        return f"{tag}-{uuid.uuid4().hex}"
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.limit:
+            self.popitem(last=False)
+
+# Profilo di render della richiesta corrente e nodo in cui ci si trova
+profiling = contextvars.ContextVar('presentation.profiling', default=None)
+frame = contextvars.ContextVar('presentation.frame', default=())
+# Identificativi dei componenti montati durante il render della pagina corrente
+mounted = contextvars.ContextVar('presentation.mounted', default=None)
+
+class profiler():
+    """
+    Misura per richiesta il tempo e le chiamate al backend di ogni nodo di render
+    (builder, render_view, render_widget) e produce un report in formato flame (stack ripiegati).
+    """
+
+    def __init__(self, route, budget):
+        self.route = route
+        self.budget = budget
+        self.nodes = {}
+
+    def node(self, path):
+        # [tempo totale, chiamate al backend, tempo dei figli]
+        return self.nodes.setdefault(path, [0.0, 0, 0.0])
+
+    def enter(self, kind, name):
+        path = (frame.get() or (self.route,)) + (f"{kind}:{name}",)
+        return path, frame.set(path), time.perf_counter()
+
+    def leave(self, token):
+        path, reset, started = token
+        elapsed = (time.perf_counter() - started) * 1000
+        frame.reset(reset)
+        self.node(path)[0] += elapsed
+        self.node(path[:-1])[2] += elapsed
+
+    def call(self):
+        self.node(frame.get() or (self.route,))[1] += 1
+
+    def report(self, limit=10):
+        """Restituisce i nodi più lenti come righe 'a;b;c <ms self> <ms totali> <chiamate>'."""
+        lines = []
+        slowest = sorted(self.nodes.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for path, (elapsed, calls, children) in slowest:
+            own = max(elapsed - children, 0.0)
+            flag = ' ⚠️' if self.budget and elapsed > self.budget else ''
+            lines.append(f"{';'.join(path)} {own:.1f}ms {elapsed:.1f}ms calls={calls}{flag}")
+        return lines
+
+def measure(kind):
+    """Registra nel profilo della richiesta il tempo di render del nodo decorato."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(self, *args, **kwargs):
+            current = profiling.get()
+            if current is None:
+                return await function(self, *args, **kwargs)
+            if kwargs.get('file'):
+                name = kwargs['file']
+            elif args and isinstance(args[0], str):
+                name = args[0]
+            else:
+                name = getattr(args[0], 'tag', kind) if args else kind
+            token = current.enter(kind, name)
+            try:
+                return await function(self, *args, **kwargs)
+            finally:
+                current.leave(token)
+        return wrapper
+    return decorator
+
 class port(ABC):
 
     def initialize(self):
-        self.components = {}
+        self.components = registry(limit=getattr(self, 'config', {}).get('components', 1024))
         self.data = {}
         self.routes = {}
+        self.trie = self.trie_node()
+        self.reports = {}
         # DOM
         self.document = {}
         fs_loader = FileSystemLoader("src/application/view/layout/")
@@ -97,8 +236,23 @@ class port(ABC):
             text = file.read()
             return text
     
-    @flow.asynchronous(managers=('defender',))
-    async def builder(self, defender,**constants):
+    @flow.asynchronous(managers=('defender','storekeeper','messenger'))
+    @measure('builder')
+    async def builder(self, defender, storekeeper, messenger, **constants):
+        # La pagina principale apre il batch delle gather e il profilo di render condivisi da tutti i widget della richiesta
+        if 'main' in constants.get('mode', []) and storekeeper.scope.get() is None:
+            route = constants.get('file', '')
+            current = profiler(route, float(getattr(self, 'config', {}).get('budget', 0) or 0))
+            scope = storekeeper.open()
+            token = profiling.set(current)
+            try:
+                return await self.builder(**constants)
+            finally:
+                profiling.reset(token)
+                storekeeper.close(scope)
+                self.reports[route] = current.report()
+                await messenger.post(domain='debug', message="🔥 Render " + route + "\n" + "\n".join(self.reports[route]))
+
         if 'text' in constants:
             text = constants['text']
         else:
@@ -118,7 +272,6 @@ class port(ABC):
             constants['inner'] = placeholder
 
         constants['user'] = await defender.whoami()
-        print(constants)
 
         content = template.render(constants)
         #print('Content:---------------------------*******************',content)
@@ -131,7 +284,6 @@ class port(ABC):
             if isinstance(inner, list):
                 inner = ''.join(str(x) for x in inner)
             view = view.replace(ppp,inner)
-        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!2",view,constants)
         return view
 
     async def rebuild(self, id, tag, **data):
@@ -159,6 +311,7 @@ class port(ABC):
           except Exception as e:
               print(f"Errore durante la ricostruzione del componente '{id}': {e}")
     
+    @measure('render_widget')
     async def render_widget(self, tag, inner, attributes, **context):
 
         widget = await self.mount_widget(tag, inner, attributes,**context)
@@ -177,71 +330,180 @@ class port(ABC):
     async def render_css(self, *services, **constants):
         await self.apply_css(*services)
 
-    def parse_route(self, file):
+    def parse_route(self, file, cache=None):
+        """
+        Compila la policy delle rotte in un trie di segmenti.
+        Le alternative {a|b} restano segmenti a insieme (non vengono espanse), i parametri {$id} diventano {id}.
+        Se `cache` indica un percorso (config 'route_cache', dentro il progetto) la tabella compilata
+        viene serializzata lì, indicizzata dall'hash dell'XML; senza percorso non si usa cache.
+        """
         # Regex per opzioni multiple senza virgolette (es. {a|b})
-        regex_simple_options = r'\{([a-zA-Z0-9_|]+)\}'
+        regex_simple_options = r'^\{([a-zA-Z0-9_]+(?:\|[a-zA-Z0-9_]+)+)\}$'
         # Regex per parametri dinamici tipo {$id} -> {id}
         regex_dynamic_param = r'\{\$([a-zA-Z0-9_]+)\}'
 
+        digest = hashlib.sha1(file.encode('utf-8')).hexdigest()
+
+        try:
+            if cache and os.path.exists(cache):
+                with open(cache, 'r', encoding='utf-8') as f:
+                    compiled = json.load(f)
+                if compiled.get('digest') == digest:
+                    self.routes = compiled['routes']
+                    self.trie = self.load_trie(compiled['trie'])
+                    return
+        except Exception as e:
+            print(f"Cache delle rotte non valida ({cache}): {e}")
+
+        self.routes = {}
+        self.trie = self.trie_node()
+        depth = 0
+
         try:
-            tree = untangle.parse(file)
-            if not tree or not tree.get_elements() or not tree.get_elements()[0].get_elements():
-                print("Errore: Il file XML è vuoto o malformato.")
-                return
-
-            for setting in tree.get_elements()[0].get_elements():
-                path_attribute = setting.get_attribute('path')
-                method = setting.get_attribute('method')
-                typee = setting.get_attribute('type')
-                view = setting.get_attribute('view')
-                layout = setting.get_attribute('layout')
+            for event, setting in ET.iterparse(io.BytesIO(file.encode('utf-8')), events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                # Solo i figli diretti della radice sono rotte
+                if depth != 1:
+                    continue
+
+                path_attribute = setting.get('path')
+                view = setting.get('view')
+                data = {
+                    'view': None, 'type': setting.get('type'),
+                    'method': setting.get('method'), 'layout': setting.get('layout')
+                }
+                setting.clear()
 
                 if view:
                     view = 'application/view/page/' + view
                     if not path_attribute:
                         path_attribute = view.replace('.xml', '')
+                data['view'] = view
 
                 # 🔥 Normalizza subito i parametri dinamici {$id} → {id}
-                path_attribute = re.sub(regex_dynamic_param, r'{\1}', path_attribute)
-
-                # Trova tutte le parti dinamiche con opzioni multiple
-                all_matches = re.finditer(regex_simple_options, path_attribute)
-                dynamic_parts = []
-                options_sets = []
-
-                for match in all_matches:
-                    dynamic_parts.append(match.group(0))  # es. "{means|product}"
-                    options_str = match.group(1)          # es. "means|product"
-                    options = options_str.split('|')      # es. ["means", "product"]
-                    options_sets.append(options)
-
-                if dynamic_parts:
-                    # Caso 1: opzioni multiple → espandi combinazioni
-                    for combination in itertools.product(*options_sets):
-                        new_path = path_attribute
-                        for i, part in enumerate(dynamic_parts):
-                            # sostituisci solo le opzioni multiple, NON i parametri dinamici
-                            if '|' in part:
-                                new_path = new_path.replace(part, combination[i], 1)
-                        self.routes[new_path] = {
-                            'view': view, 'type': typee,
-                            'method': method, 'layout': layout
-                        }
-                else:
-                    # Caso 2/3: percorsi statici o con parametri dinamici
-                    self.routes[path_attribute] = {
-                        'view': view, 'type': typee,
-                        'method': method, 'layout': layout
-                    }
+                path_attribute = re.sub(regex_dynamic_param, r'{\1}', path_attribute or '')
+
+                node = self.trie
+                for segment in path_attribute.split('/'):
+                    options = re.match(regex_simple_options, segment)
+                    if options:
+                        values = sorted(set(options.group(1).split('|')))
+                        node = self.trie_child(node['options'], values)
+                    elif re.fullmatch(r'\{([^}]+)\}', segment):
+                        node = self.trie_child(node['param'], segment[1:-1])
+                    elif '{' in segment:
+                        node = self.trie_child(node['regex'], segment)
+                    else:
+                        node = node['static'].setdefault(segment, self.trie_node())
+                if node['route'] is None:
+                    node['route'] = path_attribute
+                self.routes[path_attribute] = data
 
         except Exception as e:
             print(f"Si è verificato un errore durante il parsing del file: {e}")
+            return
 
-        print(self.routes)
+        if cache:
+            # Scrittura atomica: file temporaneo nella stessa cartella e rename
+            try:
+                folder = os.path.dirname(os.path.abspath(cache))
+                os.makedirs(folder, exist_ok=True)
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=folder, suffix='.tmp', delete=False) as f:
+                    json.dump({'digest': digest, 'routes': self.routes, 'trie': self.trie}, f)
+                os.replace(f.name, cache)
+            except Exception as e:
+                print(f"Impossibile scrivere la cache delle rotte ({cache}): {e}")
+
+        print(f"Rotte compilate: {len(self.routes)}")
+
+    @staticmethod
+    def trie_node():
+        return {'static': {}, 'options': [], 'param': [], 'regex': [], 'route': None}
+
+    def trie_child(self, branches, key):
+        for branch in branches:
+            if branch[0] == key:
+                return branch[1]
+        node = self.trie_node()
+        branches.append([key, node])
+        return node
+
+    def load_trie(self, node):
+        """Ricostruisce gli insiemi delle alternative dopo la deserializzazione JSON."""
+        node['static'] = {key: self.load_trie(child) for key, child in node['static'].items()}
+        node['options'] = [[frozenset(values), self.load_trie(child)] for values, child in node['options']]
+        node['param'] = [[name, self.load_trie(child)] for name, child in node['param']]
+        node['regex'] = [[segment, self.load_trie(child)] for segment, child in node['regex']]
+        return node
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def segment_regex(pattern):
+        """
+        Regex di un segmento misto: {nome} cattura un valore, {a|b} è un'alternativa non catturante
+        che accetta solo i valori elencati.
+        """
+        regex, names, position = '', [], 0
+        for placeholder in re.finditer(r'\{([^}]+)\}', pattern):
+            regex += re.escape(pattern[position:placeholder.start()])
+            content = placeholder.group(1)
+            if re.fullmatch(r'[a-zA-Z0-9_]+(?:\|[a-zA-Z0-9_]+)+', content):
+                regex += '(?:' + '|'.join(re.escape(value) for value in content.split('|')) + ')'
+            else:
+                regex += '([^/]+)'
+                names.append(content.lstrip('$'))
+            position = placeholder.end()
+        return regex + re.escape(pattern[position:]), names
+
+    def match_route(self, path):
+        """
+        Cerca la rotta per un path percorrendo il trie.
+        Restituisce {'view','params','layout',...} oppure None.
+        """
+        def walk(node, segments, params):
+            if not segments:
+                if node['route'] is not None:
+                    return node['route'], params
+                return None
+            segment, rest = segments[0], segments[1:]
+
+            child = node['static'].get(segment)
+            if child is not None:
+                found = walk(child, rest, params)
+                if found:
+                    return found
+            for values, child in node['options']:
+                if segment in values:
+                    found = walk(child, rest, params)
+                    if found:
+                        return found
+            if segment:
+                for name, child in node['param']:
+                    found = walk(child, rest, params | {name.lstrip('$'): segment})
+                    if found:
+                        return found
+            for pattern, child in node['regex']:
+                regex, names = self.segment_regex(pattern)
+                matched = re.fullmatch(regex, segment)
+                if matched:
+                    found = walk(child, rest, params | dict(zip(names, matched.groups())))
+                    if found:
+                        return found
+            return None
+
+        found = walk(getattr(self, 'trie', self.trie_node()), path.split('/'), {})
+        if not found:
+            return None
+        route, params = found
+        return self.routes[route] | {'params': params}
 
 
 
     @flow.asynchronous(managers=('storekeeper','messenger'))
+    @measure('render_view')
     async def render_view(self,root,data,storekeeper,messenger):
         inner = []
 
@@ -251,10 +513,9 @@ class port(ABC):
         elements = list(root)
 
         #and tag in self.tags
+        # I figli sono renderizzati in parallelo così le gather dello stesso tick finiscono nello stesso batch
         if len(elements) > 0:
-            for element in elements:
-                mounted = await self.render_view(element, data)
-                inner.append(mounted)
+            inner = list(await asyncio.gather(*[self.render_view(element, data) for element in elements]))
         
         
         
@@ -297,19 +558,27 @@ class port(ABC):
                             print(filtro)
                         else:
                             filtro = {}
+
+                        # Paginazione keyset: il cursore arriva dalla query string e torna in storekeeper.cursor
+                        if attributes.get('order_by'):
+                            query = data.get('url',{}).get('query',{}) if isinstance(data.get('url'),dict) else {}
+                            after = (query.get(attributes.get('cursor','after')) or [None])[0]
+                            if after and after.startswith('['):
+                                # Cursore composto [valore, chiave] serializzato in JSON
+                                after = json.loads(after)
+                            filtro['pagination'] = {'order_by':attributes.get('order_by'),'key':attributes.get('key','id'),'end':int(attributes.get('size',10))} | ({'after':after} if after else {})
                         
-                        transaction = await storekeeper.gather(repository=attributes.get('repository',''),filter=filtro,payload={})
+                        if profiling.get():
+                            profiling.get().call()
+                        transaction = await storekeeper.load(repository=attributes.get('repository',''),filter=filtro,payload={})
                         
                         #exit(10) 'eq': {'id':'10'}
                         #return await self.render_widget(*schema['_return'].get('args',[]), inner, attributes, **{'url':data.get('url',''),'storekeeper':transaction})
                         print(inner)
                         inner = []
                         if len(elements) > 0:
-                            for element in elements:
-                                mounted = await self.render_view(element, data|{'storekeeper':transaction})
-                                inner.append(mounted)
+                            inner = list(await asyncio.gather(*[self.render_view(element, data|{'storekeeper':transaction}) for element in elements]))
                         ok= await self.builder(file="src/application/view/component/Tiat.xml",text='<Row>{{inner|safe}}</Row>',**{'inner':inner,'url':data.get('url',''),'storekeeper':transaction})
-                        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!",ok)
                         #exit(10)
                         return ok              
             if '_type' in schema:
@@ -333,7 +602,6 @@ class port(ABC):
             return await self.render_widget(tag, inner, attributes, **{'url':data.get('url',''),'mode':['component'],'storekeeper':data.get('storekeeper',{})})
 
     async def mount_widget(self, tag, children, user_attrs, **context):
-        print(tag,'!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!',context)
         """Mounts a widget using data-driven config."""
         user_attrs = user_attrs or {}
         widget_name = tag.lower()
@@ -349,7 +617,6 @@ class port(ABC):
         # Merge attributi: unisci config + user, con gestione speciale della classe
         default_attrs = widget_config.get('attributes', {})
         #merged_attrs = {**default_attrs, **user_attrs}
-        print("USERS",user_attrs)
 
         element_tag = widget_config.get('tag')
         
@@ -391,7 +658,6 @@ class port(ABC):
                     hook_result = hook(self, element_attrs, children)
                 case 2:
                     hook_result = hook(self, element_attrs, children, user_attrs)
-                    print("HOOK RESULT:",user_attrs)
                 case 5:
                     hook_result = hook
                     pass
@@ -458,7 +724,6 @@ class port(ABC):
                             #inner.append(ggg)
                             #children = await self.builder(file=overwrite_attrs,inner=ggg,mode=['layout'])
                 case 'component':
-                    print('Component#############################################################11111#111#111#:',hook_result,element_attrs,children)
                     #exit(1)
                     def elements_to_xml_string(elements):
                         # Crea un elemento root temporaneo
@@ -482,17 +747,16 @@ class port(ABC):
                         data.pop('component')'''
                     
                     #xml_string = elements_to_xml_string(elements)
-                    url = f'application/view/component/{hook_result}.xml'
-                    print('Component#############################################################11111#111#111#:',url,element_attrs,children)
+                    url = self.components.view(hook_result)
                     #attrii = ''.join(x.outerHTML for x in att)
-                    id = element_attrs['id'] if 'id' in element_attrs else str(uuid.uuid1())
+                    id = element_attrs['id'] if 'id' in element_attrs else self.components.identifier(tag)
                     if id not in self.components:
-                        self.components[id] = {'id': id}
-                        self.components[id]['view'] = f'application/view/component/{tag}.xml'
                         #attributes = " ".join([f"{key}='{value}'" for key, value in att.items()])
                         #self.components[id]['inner'] = f"<{tag} id='{id}' >{markupsafe.Markup(xml_string)}{data.get('code','')}</{tag}>"
-                        self.components[id]['attributes'] = element_attrs
+                        self.components[id] = {'id': id, 'view': self.components.view(tag), 'attributes': element_attrs}
                         #self.components[id]['storekeeper'] = data.get('storekeeper',dict())
+                    if mounted.get() is not None:
+                        mounted.get().append(id)
 
                     '''inner = markupsafe.Markup(xml_string)+data.get('code','')
                     if 'text' in data:
@@ -504,6 +768,7 @@ class port(ABC):
                         'component':self.components.get(id,{}),
                         'file':url,
                         'inner':children,
+                        **({'text': self.components.source(hook_result)} if self.components.source(hook_result) else {}),
                         #'storekeeper':context.get('storekeeper',{})
                     }
                     argg = context|argg
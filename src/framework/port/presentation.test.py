@@ -41,6 +41,32 @@ class AdapterTest(test.test):
     async def test_render_css(self):
         pass
 
+    async def test_match_route(self):
+        self.adapter.parse_route('''<policy>
+            <route path="/" view="home.xml" type="view" method="GET"/>
+            <route path="/{means|product}/{$id}" view="item.xml" type="view" method="GET"/>
+            <route path="/x-{a|b}" view="choice.xml" type="view" method="GET"/>
+        </policy>''')
+
+        success = [
+            # 1. Rotta statica
+            {'args': ('/',), 'equal': {'view': 'application/view/page/home.xml', 'type': 'view', 'method': 'GET', 'layout': None, 'params': {}}},
+            # 2. Alternativa {a|b} con parametro dinamico {$id}
+            {'args': ('/product/10',), 'equal': {'view': 'application/view/page/item.xml', 'type': 'view', 'method': 'GET', 'layout': None, 'params': {'id': '10'}}},
+            # 3. Alternativa dentro un segmento misto
+            {'args': ('/x-b',), 'equal': {'view': 'application/view/page/choice.xml', 'type': 'view', 'method': 'GET', 'layout': None, 'params': {}}},
+        ]
+
+        failure = [
+            # 1. Valore non presente tra le alternative
+            {'args': ('/other/10',), 'equal': None},
+            # 2. Segmento misto con valore fuori dalle alternative
+            {'args': ('/x-zz',), 'equal': None},
+        ]
+
+        await self.check_cases(self.adapter.match_route, success)
+        await self.check_cases(self.adapter.match_route, failure)
+
     async def test_render_widget(self):
         pass
 
@@ -1,5 +1,91 @@
 import re
 
+placeholder = re.compile(r'\{([\w\.]+)\}')
+missing = object()
+
+class template():
+    """
+    Template di location compilato: la stringa viene divisa una sola volta in parti
+    letterali e placeholder, così la formattazione non ripete la scansione regex.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.parts = placeholder.split(text)
+        self.placeholders = self.parts[1::2]
+        self.keys = frozenset(self.placeholders)
+
+    def format(self, values):
+        # I placeholder senza valore restano invariati, come nel formato originale
+        out = []
+        for index, part in enumerate(self.parts):
+            if index % 2:
+                value = values.get(part)
+                out.append(str(value) if value else f'{{{part}}}')
+            else:
+                out.append(part)
+        return ''.join(out)
+
+class translator():
+    """
+    Piano di traduzione compilato: ogni campo foglia dello schema viene tracciato una sola volta
+    attraverso `language.translation`, ottenendo le coppie (sorgente, destinazione) da copiare colonna per colonna.
+    """
+    def __init__(self, mapper, values, input, output):
+        self.columns = []
+        leaves = self.leaves(input)
+        probe = {}
+        for index, path in enumerate(leaves):
+            self.assign(probe, path, f'\x00{index}')
+        traced = language.translation(probe, mapper, values, input, output)
+        for path, value in self.walk(traced):
+            if not (isinstance(value, str) and value.startswith('\x00') and value[1:].isdigit()):
+                # Il valore è stato trasformato: il mapping non è una semplice proiezione
+                raise ValueError(f"Campo non proiettabile: {'.'.join(path)}")
+            self.columns.append((leaves[int(value[1:])], path))
+
+    def leaves(self, schema, prefix=()):
+        paths = []
+        for key, field in schema.items():
+            if isinstance(field, dict) and field.get('type') == 'dict' and isinstance(field.get('schema'), dict):
+                paths.extend(self.leaves(field['schema'], prefix + (key,)))
+            else:
+                paths.append(prefix + (key,))
+        return paths
+
+    def walk(self, data, prefix=()):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                yield from self.walk(value, prefix + (key,))
+            else:
+                yield prefix + (key,), value
+
+    def assign(self, data, path, value):
+        for key in path[:-1]:
+            data = data.setdefault(key, {})
+        data[path[-1]] = value
+
+    def column(self, rows, path):
+        values = []
+        for row in rows:
+            for key in path:
+                row = row.get(key, missing) if isinstance(row, dict) else missing
+                if row is missing:
+                    break
+            values.append(row)
+        return values
+
+    def __call__(self, rows):
+        # Estrae ogni colonna in un solo passaggio e ricompone le righe tradotte;
+        # le righe con campi mancanti restano None (default e valori dipendono dalla traduzione per riga)
+        out = [{} for _ in rows]
+        for source, target in self.columns:
+            for index, value in enumerate(self.column(rows, source)):
+                if value is missing:
+                    out[index] = None
+                elif out[index] is not None:
+                    self.assign(out[index], target, value)
+        return out
+
 class repository():
     def __init__(self, **constants):
         self.location = constants.get('location',{})
@@ -8,45 +94,59 @@ class repository():
         self.payloads = constants.get('payloads',{})
         self.functions = constants.get('functions',{})
         self.schema = constants.get('model')
+        # Policy di selezione dei provider: 'all', 'primary', 'hedged', 'fastest', 'cheapest' o un dict per operazione
+        self.policy = constants.get('policy', 'all')
+        # TTL (secondi) della cache di lettura dello storekeeper, globale o per operazione ('read', 'view')
+        self.ttl = constants.get('ttl', 0)
+        # Micro-batching delle scritture: finestra in secondi (0 disattiva) e dimensione massima del batch
+        self.window = constants.get('window', 0)
+        self.size = constants.get('size', 100)
+        # Proiezione delle letture (su richiesta): lista o dict per profilo, True per derivarla da mapper e schema
+        self.fields = constants.get('fields')
+        self.templates = {}
+        self.compiled = {}
+        self.placeholders = {}
+        self.projections = {}
+
+        # Compila i template per profilo, ordinati per numero di placeholder (a parità vince l'ultimo)
+        for profile, templates in self.location.items():
+            compiled = [self.compile(text) for text in templates]
+            self.compiled[profile] = [compiled[index] for index in sorted(range(len(compiled)), key=lambda index: (len(compiled[index].placeholders), index), reverse=True)]
+            self.placeholders[profile] = frozenset().union(*[item.keys for item in compiled])
+
+    def compile(self, text):
+        if text not in self.templates:
+            self.templates[text] = template(text)
+        return self.templates[text]
+
+    def resolve(self, keys, data):
+        """Risolve una sola volta ogni placeholder e restituisce i valori disponibili."""
+        values = {}
+        for key in keys:
+            value = language.get(key,data)
+            if value:
+                values[key] = value
+        return values
 
     def can_format(self,template, data):
             """
             Verifica se una singola stringa `template` può essere formattata utilizzando le chiavi di un dizionario `data`.
             """
             try:
-                placeholders = re.findall(r'\{([\w\.]+)\}', template)
-                gg = []
-                for key in placeholders:
-                    a = language.get(key,data)
-                    if a:
-                        gg.append(True)
-                    else:
-                         gg.append(False)
-
-                # Controlla che tutti i placeholder siano presenti nelle chiavi del dizionario
-                #return all(key in data for key in placeholders)
-                #print(f"Template: {template}, all, Stato: {all(gg)}",data)
-                return (all(gg),len(placeholders))
+                compiled = self.compile(template)
+                values = self.resolve(compiled.keys, data)
+                return (compiled.keys <= values.keys(),len(compiled.placeholders))
             except Exception as e:
                 print(f"Errore durante la verifica: {e}")
                 return False
             
     def do_format(self,template, data):
             """
-            Verifica se una singola stringa `template` può essere formattata utilizzando le chiavi di un dizionario `data`.
+            Formatta la stringa `template` con i valori del dizionario `data`.
             """
             try:
-                #placeholders = re.findall(r'\{(\w+)\}', template)
-                placeholders = re.findall(r'\{([\w\.]+)\}', template)
-                print(f"Template: {template}, Placeholders: {placeholders}")
-                for key in placeholders:
-                    print('Key',key)
-                    a = language.get(key,data)
-                    print(f"Key: {key}, Value: {a}")
-                    if a:
-                        template = template.replace(f'{{{key}}}',str(a))
-                print(f"Template: {template},",data)
-                return template
+                compiled = self.compile(template)
+                return compiled.format(self.resolve(compiled.keys, data))
             except Exception as e:
                 print(f"Errore durante la verifica: {e}")
                 return False
@@ -61,16 +161,41 @@ class repository():
         """
         best_template = None
         max_placeholders = 0
-        #print(f"Templates: {templates}")
         for template in templates:
             can_format_result, num_placeholders = self.can_format(template, data)
-            print(f"Template: {template}, Stato: {can_format_result}, Numero di placeholder: {num_placeholders}",data)
             if can_format_result and num_placeholders >= max_placeholders:
                 best_template = template
                 max_placeholders = num_placeholders
-        #print(f"Template: {best_template}, Stato: {max_placeholders}",data)
         return best_template
 
+    def format(self, profile, data):
+        """
+        Seleziona e formatta il template del profilo che soddisfa più placeholder.
+        I placeholder del profilo vengono risolti una volta sola; la scelta è un controllo fra insiemi di chiavi.
+        """
+        values = self.resolve(self.placeholders.get(profile, frozenset()), data)
+        available = values.keys()
+        for compiled in self.compiled.get(profile, []):
+            if compiled.keys <= available:
+                return compiled.format(values)
+        return None
+
+    def projection(self, input, output):
+        """
+        Compila (una volta per coppia di schemi) il piano di traduzione; None se serve la traduzione per riga.
+        Con `values` la traduzione dipende dal valore dei campi e il tracciamento non basta: si traduce per riga.
+        """
+        if self.values:
+            return None
+        key = (id(input), id(output))
+        if key not in self.projections:
+            try:
+                self.projections[key] = translator(self.mapper, self.values, input, output)
+            except Exception as e:
+                print(f"Traduzione non compilabile, uso quella per riga: {e}")
+                self.projections[key] = None
+        return self.projections[key]
+
     async def results(self, **data):
         print("RESULTS",data)
         try:
@@ -83,19 +208,24 @@ class repository():
             if not isinstance(results, list):
                 raise ValueError("Il campo 'result' deve essere una lista.")
 
-            # Elabora i risultati
+            # Elabora i risultati con il piano compilato, se disponibile
+            rows = [item for item in results if isinstance(item, dict)]
+            plan = self.projection(self.schema, self.schema) if isinstance(self.schema, dict) else None
+            planned = plan(rows) if plan else [None] * len(rows)
             r = []
-            for item in results:
-                if isinstance(item, dict):
-                    try:
-                        #(data_dict, mapper, values, input, output)
-                        translated_item = language.translation(
-                            item, self.mapper, self.values, self.schema, self.schema
-                        )
-                        r.append(translated_item)
-                    except Exception as e:
-                        print(f"Errore durante la traduzione dell'elemento {item}: {e}")
-                        continue  # Salta l'elemento corrente in caso di errore
+            for item, translated_item in zip(rows, planned):
+                if translated_item is not None:
+                    r.append(translated_item)
+                    continue
+                try:
+                    #(data_dict, mapper, values, input, output)
+                    translated_item = language.translation(
+                        item, self.mapper, self.values, self.schema, self.schema
+                    )
+                    r.append(translated_item)
+                except Exception as e:
+                    print(f"Errore durante la traduzione dell'elemento {item}: {e}")
+                    continue  # Salta l'elemento corrente in caso di errore
 
             # Aggiorna i risultati nella transazione
             transaction['result'] = r
@@ -142,15 +272,11 @@ class repository():
             combined_parameters = {**inputs, **payload}
             print("Combined parameters:", combined_parameters)
 
-            # Trova il template formattabile
-            templates = self.location.get(profile, [''])
-            template = self.find_first_formattable_template(templates, combined_parameters)
-            if not template:
+            # Seleziona e formatta il template compilato
+            path = self.format(profile, combined_parameters)
+            if not path:
                 raise ValueError(f"Nessun template formattabile trovato per il profilo: {profile}")
-            print("Selected template:", template)
-
-            # Format il percorso
-            path = self.do_format(template, combined_parameters)
+            print("Selected location:", path)
             
             
             # Restituisci i risultati
@@ -23,7 +23,37 @@ class TestRepository(unittest.IsolatedAsyncioTestCase):
             model=model
         )
 
-    # === do_format ===
+    # === format ===
+    def test_format(self):
+        data = {
+            "payload": {
+                "location": "user/repo",
+                "path": "src"
+            }
+        }
+        # Vince il template con più placeholder tutti disponibili
+        self.assertEqual(self.repo.format("dev", data), "repos/user/repo/contents/src")
+        data["payload"]["name"] = "main.py"
+        self.assertEqual(self.repo.format("dev", data), "repos/user/repo/contents/src/main.py")
+        self.assertIsNone(self.repo.format("dev", {}))
+
+    # === results con piano compilato ===
+    async def test_projection(self):
+        schema = {
+            'name': {'type': 'string'},
+            'detail': {'type': 'dict', 'schema': {'size': {'type': 'integer'}}},
+        }
+        repo = factory.repository(location={}, mapper={}, values={}, model=schema)
+        rows = [{'name': 'a', 'detail': {'size': 1}}, {'name': 'b'}]
+        # Il piano deve produrre lo stesso risultato della traduzione per riga
+        expected = [language.translation(dict(row), repo.mapper, repo.values, schema, schema) for row in rows]
+        result = await repo.results(transaction={'result': [dict(row) for row in rows]})
+        self.assertEqual(result['result'], expected)
+
+        # Con 'values' il piano non viene usato
+        repo.values = {'name': {'a': 'A'}}
+        self.assertIsNone(repo.projection(schema, schema))
+
     '''def test_do_format(self):
         template = "repos/{payload.location}/contents/{payload.path}"
         data = {
@@ -0,0 +1,53 @@
+import sys
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class pool():
+    """
+    Mixin degli adapter HTTP: una sessione aiohttp condivisa per adapter, con pool di connessioni
+    configurabile (pool, pool_per_host, dns_cache, keepalive) e contatori delle richieste.
+    """
+    session = None
+    requests = 0
+    active = 0
+
+    async def connect(self):
+        """Sessione HTTP condivisa con pool di connessioni (keep-alive, limite per host, cache DNS)."""
+        if sys.platform == 'emscripten' or aiohttp is None:
+            return None
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=int(self.config.get('pool', 100)),
+                limit_per_host=int(self.config.get('pool_per_host', 10)),
+                ttl_dns_cache=int(self.config.get('dns_cache', 300)),
+                keepalive_timeout=float(self.config.get('keepalive', 30)),
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def send(self, backend, method, url, headers, payload):
+        """Invoca il backend dell'adapter con la sessione condivisa, contando le richieste servite e in corso."""
+        self.requests += 1
+        self.active += 1
+        try:
+            return await backend(method, url, headers, payload, await self.connect())
+        finally:
+            self.active -= 1
+
+    def metrics(self):
+        """Metriche del pool: richieste servite, richieste in corso e limiti del connettore."""
+        connector = getattr(self.session, 'connector', None)
+        return {
+            'requests': self.requests,
+            'active': self.active,
+            'limit': connector.limit if connector else 0,
+            'limit_per_host': connector.limit_per_host if connector else 0,
+        }
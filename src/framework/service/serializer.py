@@ -0,0 +1,100 @@
+import json
+import zlib
+from ast import literal_eval
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Intestazione dei payload: magic, versione del formato, codec (bit alto = compresso con zlib)
+MAGIC = b'\xfe'
+VERSION = 1
+COMPRESSED = 0x80
+
+def json_dumps(value):
+    return json.dumps(value, default=str, separators=(',', ':')).encode('utf-8')
+
+def json_loads(data):
+    return json.loads(data)
+
+def orjson_dumps(value):
+    return orjson.dumps(value, default=str)
+
+def msgpack_dumps(value):
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+def msgpack_loads(data):
+    return msgpack.unpackb(data, raw=False)
+
+codecs = {
+    'json': (1, json_dumps, json_loads),
+    'orjson': (2, orjson_dumps, orjson.loads if orjson else json_loads),
+    'msgpack': (3, msgpack_dumps, msgpack_loads),
+}
+identifiers = {code: name for name, (code, _, _) in codecs.items()}
+
+def available(name):
+    """Verifica se il codec (senza suffisso di compressione) è utilizzabile in questo ambiente."""
+    return (name == 'json') or (name == 'orjson' and orjson is not None) or (name == 'msgpack' and msgpack is not None)
+
+def codec(name='json'):
+    """
+    Risolve il nome configurato ('json', 'orjson', 'msgpack', con '+zlib' per la compressione)
+    in (nome, compresso); i codec non installati ripiegano su json.
+    """
+    name = (name or 'json').lower()
+    compressed = name.endswith('+zlib')
+    name = name.removesuffix('+zlib')
+    if name not in codecs:
+        raise ValueError(f"Serializer non supportato: {name}")
+    if not available(name):
+        name = 'orjson' if name == 'msgpack' and orjson is not None else 'json'
+    return name, compressed
+
+def encode(value, name='json'):
+    """Serializza un valore con l'intestazione di versione, così i lettori riconoscono il codec usato."""
+    name, compressed = codec(name)
+    code, dumps, _ = codecs[name]
+    body = dumps(value)
+    if compressed:
+        body = zlib.compress(body)
+        code |= COMPRESSED
+    return MAGIC + bytes([VERSION, code]) + body
+
+def decode(data):
+    """
+    Deserializza un payload con intestazione; i payload senza intestazione (nodi non aggiornati)
+    vengono letti come JSON o, in ultima istanza, come letterale Python.
+    """
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if data[:1] == MAGIC and len(data) >= 3:
+        version, code = data[1], data[2]
+        if version != VERSION:
+            raise ValueError(f"Versione del payload non supportata: {version}")
+        body = data[3:]
+        if code & COMPRESSED:
+            body = zlib.decompress(body)
+        name = identifiers.get(code & ~COMPRESSED)
+        # orjson produce JSON standard: senza la libreria si legge con json.loads
+        if name is None or (name == 'msgpack' and msgpack is None):
+            raise ValueError(f"Codec del payload non disponibile: {code & ~COMPRESSED}")
+        return codecs[name][2](body)
+
+    text = data.decode('utf-8')
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
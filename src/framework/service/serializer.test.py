@@ -0,0 +1,40 @@
+resources = {
+    'serializer': 'framework/service/serializer.py',
+    'test': 'framework/service/test.py',
+}
+
+class TestModule(test.test):
+
+    async def test_encode(self):
+        """Verifica che encode/decode restituiscano il valore originale per ogni codec."""
+        value = {'identifier': 'abc', 'payload': {'items': [1, 2, 3], 'name': 'test'}}
+        roundtrip = lambda name: serializer.decode(serializer.encode(value, name))
+        success = [
+            {'args':('json'),'equal':value},
+            {'args':('orjson'),'equal':value},
+            {'args':('msgpack'),'equal':value},
+            {'args':('json+zlib'),'equal':value},
+            {'args':('orjson+zlib'),'equal':value},
+        ]
+        failure = [
+            {'args':('yaml'), 'error': ValueError},
+        ]
+
+        await self.check_cases(roundtrip, success)
+        await self.check_cases(roundtrip, failure)
+
+    async def test_decode(self):
+        """Verifica la lettura dei payload con intestazione e di quelli senza (nodi non aggiornati)."""
+        success = [
+            {'args':(b'\xfe\x01\x02{"name":"test"}'),'equal':{'name': 'test'}},
+            {'args':(b'{"name": "test"}'),'equal':{'name': 'test'}},
+            {'args':("{'name': 'test'}"),'equal':{'name': 'test'}},
+            {'args':(b'plain'),'equal':'plain'},
+            {'args':(None),'equal':None},
+        ]
+        failure = [
+            {'args':(b'\xfe\x09\x01{}'), 'error': ValueError},
+        ]
+
+        await self.check_cases(serializer.decode, success)
+        await self.check_cases(serializer.decode, failure)
@@ -1,4 +1,4 @@
-modules = {'flow': 'framework.service.flow',}
+modules = {'flow': 'framework.service.flow', 'pool': 'framework.service.pool',}
 
 import sys
 import json
@@ -206,7 +206,7 @@ if sys.platform == 'emscripten':
     import pyodide
     import json
 
-    async def backend(method,url,headers,payload):
+    async def backend(method,url,headers,payload,session=None):
         match method:
             case 'GET':
                 response = await pyodide.http.pyfetch(url, method=method, headers=headers)
@@ -228,17 +228,16 @@ else:
     import json
 
     #@flow.asynchronous
-    async def backend(method,url,headers,payload):
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method=method, url=url, headers=headers, json=payload) as response:
-                if response.status in [200, 201]:
-                    data = await response.json()
-                    
-                    return {"state": True, "result": data}
-                else:
-                    return {"state": False, "remark": f"Request failed with status {response.status}"}
+    async def backend(method,url,headers,payload,session):
+        async with session.request(method=method, url=url, headers=headers, json=payload) as response:
+            if response.status in [200, 201]:
+                data = await response.json()
+                
+                return {"state": True, "result": data}
+            else:
+                return {"state": False, "remark": f"Request failed with status {response.status}"}
 
-class adapter():
+class adapter(pool.pool):
     
     def __init__(self, **constants):
         self.config = constants['config']
@@ -265,7 +264,7 @@ class adapter():
         #if payload and method == 'GET':
         #    url += '?' + urlencode(payload)
         
-        ok = await backend(method,url,headers,payload)
+        ok = await self.send(backend,method,url,headers,payload)
         print('request:',constants,'output:',ok)
         return ok  
     
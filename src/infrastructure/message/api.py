@@ -17,13 +17,13 @@ def add_query_params(url, params):
     new_url = urlunparse(url_parts._replace(query=new_query))
     return new_url
 
-modules = {'flow': 'framework.service.flow',}
+modules = {'flow': 'framework.service.flow', 'pool': 'framework.service.pool',}
 
 if sys.platform == 'emscripten':
     import pyodide
     import json
 
-    async def backend(method,url,headers,payload):
+    async def backend(method,url,headers,payload,session=None):
         match method:
             case 'GET':
                 response = await pyodide.http.pyfetch(url, method=method, headers=headers)
@@ -45,16 +45,15 @@ else:
     import json
 
     #@flow.asynchronous
-    async def backend(method,url,headers,payload):
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method=method, url=url, headers=headers, json=payload) as response:
-                data = await response.json()
-                if response.status in [200, 201]:
-                    return {"state": True, "result": data}
-                else:
-                    return {"state": False, "remark": f"Request failed with status {response.status}", "result":data}
+    async def backend(method,url,headers,payload,session):
+        async with session.request(method=method, url=url, headers=headers, json=payload) as response:
+            data = await response.json()
+            if response.status in [200, 201]:
+                return {"state": True, "result": data}
+            else:
+                return {"state": False, "remark": f"Request failed with status {response.status}", "result":data}
 
-class adapter():
+class adapter(pool.pool):
     
     def __init__(self, **constants):
         self.config = constants['config']
@@ -98,7 +97,7 @@ class adapter():
         print(f"DEBUG - URL: {url}")
         print(f"DEBUG - Headers: {headers}")
         print(f"DEBUG - Payload: {payload}")
-        resp = await backend(method,url,headers,payload)
+        resp = await self.send(backend,method,url,headers,payload)
         print('request:',constants,'output:',resp)
 
 
@@ -2,9 +2,11 @@ import asyncio
 import redis.asyncio as r
 import framework.port.message as message
 import framework.service.flow as flow
+import framework.service.serializer as serializer
 import datetime
-from ast import literal_eval
 import importlib
+import os
+import socket
 import json
 
 class adapter(message.port):
@@ -13,6 +15,13 @@ class adapter(message.port):
         self.config = constants['config'] 
         self.connection = self.loader()
         self.processable = dict()
+        # Codec dei payload ('json', 'orjson', 'msgpack', con suffisso '+zlib' per la compressione)
+        self.serializer = self.config.get('serializer', 'json')
+        # Correlazione delle risposte: identificativo -> future in attesa, notificate sul canale 'replies'
+        self.replies = self.config.get('replies', 'replies')
+        self.waiters = dict()
+        self.listener = None
+        self.subscribing = asyncio.Lock()
 
     def loader(self,*managers,**constants):
         return r.from_url(f"redis://{self.config['host']}:{self.config['port']}")
@@ -33,7 +42,7 @@ class adapter(message.port):
         identifier = constants['identifier'] if 'identifier' in constants else ''
         #value = str(storekeeper.builder('action:'+constants['name'],payload))
         
-        await self.signal(keys=domain,value=str(payload),identifier=identifier,name=constants['name'])
+        await self.signal(keys=domain,value=payload,identifier=identifier,name=constants['name'])
         #await worker.app.broker.xadd(key, {'message': value},maxlen=10)
         #b = await worker.app.broker.xlen(key)
         #print(b)
@@ -59,24 +68,61 @@ class adapter(message.port):
             future = asyncio.create_task(reader(pubsub))
             await future
             #await pubsub.psubscribe("tokens")'''
+        # Attende la notifica della risposta invece di interrogare lo storekeeper a intervalli
         identifier = constants['identifier']
-        max = 0
-        while max < 10:
-            await asyncio.sleep(0.5)
+        timeout = float(constants.get('timeout', self.config.get('timeout', 5)))
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(identifier, []).append(future)
+        try:
+            await self.listening()
+            # La risposta potrebbe essere arrivata prima della registrazione
             output = await storekeeper.get(model='transaction',identifier=identifier)
-            if output != None and output['state']:
-                await storekeeper.pull(model='transaction',identifier=identifier)
-                return output
-            max += 1
+            if output == None or not output['state']:
+                await asyncio.wait_for(future, timeout)
+                output = await storekeeper.get(model='transaction',identifier=identifier)
+        except asyncio.TimeoutError:
+            output = None
+        finally:
+            waiters = self.waiters.get(identifier, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self.waiters.pop(identifier, None)
+        if output != None and output['state']:
+            await storekeeper.pull(model='transaction',identifier=identifier)
+            return output
         return storekeeper.builder('transaction',{'identifier':identifier,'state':False})
+
+    async def listening(self):
+        # Un solo listener per adapter: la sottoscrizione avviene prima che i waiter attendano
+        async with self.subscribing:
+            if self.listener is None or self.listener.done():
+                pubsub = self.connection.pubsub()
+                await pubsub.subscribe(self.replies)
+                self.listener = asyncio.create_task(self.listen(pubsub))
+
+    async def listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                identifier = message['data'].decode('utf-8') if isinstance(message['data'], bytes) else message['data']
+                for future in self.waiters.pop(identifier, []):
+                    if not future.done():
+                        future.set_result(True)
+        except Exception as e:
+            print(f"Listener delle risposte interrotto: {e}")
+        finally:
+            await pubsub.reset()
         
 
     async def signal(self,**constants):
         for key in constants['keys']:
             #await constants['app'].broker.publish(key, constants['value'])
             #await constants['app'].broker.xadd(key,{ 'v': constants['value'] })
-            pp = constants['value']
-            await self.connection.xadd(self.app,{'identifier':constants['identifier'],'payload':pp,'domain':key,'action':constants['name'],'time':str(datetime.datetime.now())})
+            pp = serializer.encode(constants['value'], self.serializer)
+            # Con XACK le voci non vengono cancellate: lo stream è limitato (MAXLEN approssimato)
+            await self.connection.xadd(self.app,{'identifier':constants['identifier'],'payload':pp,'domain':key,'action':constants['name'],'time':str(datetime.datetime.now())},maxlen=int(self.config.get('maxlen', 10000)),approximate=True)
         
         #print( f"stream '{sname}' length: {r.xlen( stream_key )}")
 
@@ -93,30 +139,111 @@ class adapter(message.port):
             return True
         except ImportError:return False
 
+    async def group(self, domain, group):
+        # Crea il consumer group (e lo stream) se non esiste ancora
+        try:
+            await self.connection.xgroup_create(domain, group, id='0', mkstream=True)
+        except r.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def handle(self, storekeeper, messenger, domain, group, action, id, payload):
+        # Il payload può essere binario (msgpack, zlib): si decodifica a parte
+        body = payload.pop(b'payload', None)
+        str_dict = {k.decode('utf-8'): v.decode('utf-8') for k, v in payload.items()}
+        a = storekeeper.builder('event',str_dict)
+        key = a['domain'].split('.')
+        name = key[len(key)-1]
+        if name != action:
+            # Ogni azione ha il proprio gruppo: gli altri messaggi li consuma il gruppo che li sa gestire
+            await self.connection.xack(domain, group, id)
+            return
+        a['payload'] = serializer.decode(body)
+        response = await self.processable[name](**a)
+        await self.connection.xack(domain, group, id)
+        await messenger.post(name="log",value=f"Action start {name}")
+        if 'identifier' in a and  '' != a['identifier']:
+            await storekeeper.put(model='transaction',identifier=a['identifier'],value=response)
+            await self.connection.publish(self.replies, a['identifier'])
+
     @flow.asynchronous(ports=('storekeeper','messenger'))
     async def react(self, storekeeper,messenger, **constants):
-        while True:
-            await asyncio.sleep(1.1)
-            message = await self.connection.xread(count=1, streams={constants['domain']:0} )
-            
-            if len(message) != 0:
-                id = message[0][1][0][0]
-                payload = message[0][1][0][1]
-               # print(l)
-                #await constants['app'].broker.xack(constants['keys'][0],'',l[0][1][0][0])
-                #print(payload)
-                
-                str_dict = {k.decode('utf-8'): v.decode('utf-8') for k, v in payload.items()}
-                a = storekeeper.builder('event',str_dict)
-                key = a['domain'].split('.')
-                a['payload'] = literal_eval(a['payload'])
-                name = key[len(key)-1]
-                if name in self.processable:
-                    
-                    await self.connection.xdel(constants['domain'],id)
-                    #print(a)
-                    response = await self.processable[name](**a)
-                    await messenger.post(name="log",value=f"Action start {name}")
-                    #print(response)
-                    if 'identifier' in a and  '' != a['identifier']:
-                        await storekeeper.put(model='transaction',identifier=a['identifier'],value=response)
\ No newline at end of file
+        """
+        Consuma lo stream del dominio con XREADGROUP, un consumer group per azione ('{group}.{azione}'):
+        ogni messaggio arriva a tutti i gruppi, lo elabora un solo worker del gruppo della sua azione
+        e gli altri gruppi lo confermano subito. Le azioni registrate dopo l'avvio (can) vengono
+        scoperte ogni 'discovery' secondi; la concorrenza per consumer è condivisa fra le azioni.
+        """
+        domain = constants['domain']
+        prefix = constants.get('group', self.config.get('group', domain))
+        consumer = constants.get('consumer', self.config.get('consumer', f"{socket.gethostname()}-{os.getpid()}"))
+        semaphore = asyncio.Semaphore(int(self.config.get('concurrency', 4)))
+        discovery = float(self.config.get('discovery', 5))
+        consumers = {}
+        try:
+            while True:
+                for action in list(self.processable):
+                    if action not in consumers or consumers[action].done():
+                        consumers[action] = asyncio.create_task(self.consume(storekeeper, messenger, domain, f"{prefix}.{action}", action, consumer, semaphore))
+                await asyncio.sleep(discovery)
+        finally:
+            for task in consumers.values():
+                task.cancel()
+
+    async def consume(self, storekeeper, messenger, domain, group, action, consumer, semaphore):
+        """
+        Ciclo di un consumer group: XREADGROUP bloccante a blocchi di 'count', XACK dopo l'elaborazione
+        e XAUTOCLAIM dei messaggi rimasti pendenti oltre 'idle' millisecondi (worker caduti).
+        """
+        block = int(self.config.get('block', 5000))
+        count = int(self.config.get('count', 10))
+        idle = int(self.config.get('idle', 60000))
+        interval = float(self.config.get('reclaim', 30))
+        running = set()
+
+        async def process(id, payload):
+            try:
+                await self.handle(storekeeper, messenger, domain, group, action, id, payload)
+            except Exception as e:
+                # Senza XACK il messaggio resta pendente e verrà reclamato
+                print(f"Errore durante l'elaborazione del messaggio {id}: {e}")
+            finally:
+                semaphore.release()
+
+        async def dispatch(entries):
+            for id, payload in entries:
+                if not payload:
+                    # Voce cancellata dallo stream ma ancora pendente
+                    await self.connection.xack(domain, group, id)
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(process(id, payload))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+        await self.group(domain, group)
+        reclaimed = 0
+        try:
+            while True:
+                now = asyncio.get_running_loop().time()
+                if now - reclaimed >= interval:
+                    reclaimed = now
+                    start = '0-0'
+                    while True:
+                        response = await self.connection.xautoclaim(domain, group, consumer, idle, start_id=start, count=count)
+                        start, entries = response[0], response[1]
+                        await dispatch(entries)
+                        if start in (b'0-0', '0-0'):
+                            break
+
+                streams = await self.connection.xreadgroup(group, consumer, {domain: '>'}, count=count, block=block)
+                if isinstance(streams, dict):
+                    streams = [(name, entries[0] if entries and isinstance(entries[0], list) else entries) for name, entries in streams.items()]
+                for _, entries in streams or []:
+                    await dispatch(entries)
+        except Exception as e:
+            # Il ciclo viene riavviato da react alla prossima scoperta
+            print(f"Consumer {group} interrotto: {e}")
+        finally:
+            for task in running:
+                task.cancel()
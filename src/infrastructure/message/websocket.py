@@ -46,6 +46,15 @@ class adapter:
         payload = payload.data
         
         payload = json.loads(payload) if isinstance(payload, str) else payload
+
+        # Patch DOM dei componenti ({"type": "patch", "id", "patches"}): non hanno dominio,
+        # vanno a chi legge 'patch' o '*' (il bond della presentazione wasm)
+        if payload.get("type") == "patch":
+            for x in ("patch", "*"):
+                if x in self.listeners:
+                    self.listeners[x].put_nowait(payload)
+            return
+
         domain = payload.get("domain", [])
         message = payload.get("message", [])
 
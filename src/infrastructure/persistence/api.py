@@ -17,13 +17,13 @@ def add_query_params(url, params):
     new_url = urlunparse(url_parts._replace(query=new_query))
     return new_url
 
-modules = {'flow': 'framework.service.flow',}
+modules = {'flow': 'framework.service.flow', 'pool': 'framework.service.pool',}
 
 if sys.platform == 'emscripten':
     import pyodide
     import json
 
-    async def backend(method,url,headers,payload):
+    async def backend(method,url,headers,payload,session=None):
         match method:
             case 'GET':
                 response = await pyodide.http.pyfetch(url, method=method, headers=headers)
@@ -71,17 +71,16 @@ else:
     import json
 
     #@flow.asynchronous
-    async def backend(method,url,headers,payload):
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method=method, url=url, headers=headers, json=payload) as response:
-                if response.status in [200, 201]:
-                    data = await response.json()
-                    
-                    return {"state": True, "result": data}
-                else:
-                    return {"state": False, "remark": f"Request failed with status {response.status}"}
+    async def backend(method,url,headers,payload,session):
+        async with session.request(method=method, url=url, headers=headers, json=payload) as response:
+            if response.status in [200, 201]:
+                data = await response.json()
+                
+                return {"state": True, "result": data}
+            else:
+                return {"state": False, "remark": f"Request failed with status {response.status}"}
 
-class adapter():
+class adapter(pool.pool):
     
     def __init__(self, **constants):
         self.config = constants['config']
@@ -101,10 +100,24 @@ class adapter():
         payload = constants.get('payload',{})
         url = f"{self.api_url}/{location}"
 
+        # Proiezione: inviata solo se l'API dichiara il nome del parametro (es. 'select' o 'fields')
+        if constants.get('fields') and self.config.get('fields'):
+            url = add_query_params(url, {self.config['fields']: ','.join(constants['fields'])})
+
+        # Paginazione keyset: i nomi dei parametri di query sono configurabili per API
+        pagination = (constants.get('filter') or {}).get('pagination',{})
+        if 'after' in pagination or 'order_by' in pagination:
+            params = {self.config.get('limit','limit'): pagination.get('end',10)}
+            if pagination.get('order_by'):
+                params[self.config.get('order_by','order_by')] = pagination['order_by']
+            if pagination.get('after') is not None:
+                params[self.config.get('after','after')] = pagination['after']
+            url = add_query_params(url, params)
+
         #if payload and method == 'GET':
         #    url += '?' + urlencode(payload)
         
-        ok = await backend(method,url,headers,payload)
+        ok = await self.send(backend,method,url,headers,payload)
         print('request:',constants,'output:',ok)
         return ok
         
@@ -1,18 +1,21 @@
 import sys
 
-modules = {'flow': 'framework.service.flow','persistence': 'framework.port.persistence'}
+modules = {'flow': 'framework.service.flow','persistence': 'framework.port.persistence','pool': 'framework.service.pool'}
 
 if sys.platform == 'emscripten':
     import pyodide
     import json
 else:
     import aiohttp
+    import asyncio
     import time
     import jwt
     import json
     import base64
+    from datetime import datetime
+    from collections import OrderedDict
 
-class adapter(persistence.port):
+class adapter(persistence.port, pool.pool):
     
     def __init__(self, **constants):
         """
@@ -33,6 +36,20 @@ class adapter(persistence.port):
 
         self.token_expiry = int(time.time()) + (10 * 60)  # Scadenza di 10 minuti per il token
         self.token = self.generate_jwt()
+
+        # Token di installazione in cache fino a poco prima di expires_at (margine in secondi)
+        self.access_token = None
+        self.access_expiry = 0
+        self.margin = int(self.config.get('token_margin', 60))
+        self.refreshing = None
+        # Cache degli sha: (repo, branch, percorso) -> sha, alimentata da read, scritture e view
+        # (branch None = branch di default del repository)
+        self.shas = {}
+        # Cache LRU dei contenuti letti: (repo, branch, percorso) -> {'etag', 'file'} per le read condizionali
+        self.contents = OrderedDict()
+        self.limit = int(self.config.get('content_cache', 256))
+        # Branch di default per repository, letto una sola volta
+        self.branches = {}
     
     def generate_jwt(self):
         """
@@ -65,18 +82,92 @@ class adapter(persistence.port):
         """
         Ottieni un token di accesso per l'installazione della GitHub App.
         """
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.api_url}/app/installations/{self.installation_id}/access_tokens"
-            headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Accept": "application/vnd.github+json",
-            }
-            async with session.post(url, headers=headers) as response:
-                if response.status == 201:
-                    data = await response.json()
-                    return data["token"]
+        await self.refresh_token()
+        session = await self.connect()
+        url = f"{self.api_url}/app/installations/{self.installation_id}/access_tokens"
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Accept": "application/vnd.github+json",
+        }
+        async with session.post(url, headers=headers) as response:
+            if response.status == 201:
+                data = await response.json()
+                expires_at = data.get("expires_at")
+                if expires_at:
+                    self.access_expiry = datetime.fromisoformat(expires_at.replace("Z", "+00:00")).timestamp()
                 else:
-                    raise Exception(f"Failed to get access token: {response.status}")
+                    self.access_expiry = time.time() + 3600
+                self.access_token = data["token"]
+                return data["token"]
+            else:
+                raise Exception(f"Failed to get access token: {response.status}")
+
+    async def installation_token(self):
+        """
+        Restituisce il token di installazione in cache; il rinnovo è single-flight,
+        le chiamate concorrenti attendono la stessa richiesta.
+        """
+        if self.access_token and time.time() < self.access_expiry - self.margin:
+            return self.access_token
+        if self.refreshing is None:
+            self.refreshing = asyncio.ensure_future(self.get_access_token())
+        refreshing = self.refreshing
+        try:
+            return await asyncio.shield(refreshing)
+        finally:
+            if self.refreshing is refreshing and refreshing.done():
+                self.refreshing = None
+
+    async def sha(self, repo, file_path, branch=None):
+        """Sha del file sul branch dalla cache, altrimenti da una read (che popola la cache)."""
+        if (repo, branch, file_path) not in self.shas:
+            file = await self.read(repo=repo, file_path=file_path, branch=branch)
+            if not file.get('state'):
+                return None
+        return self.shas.get((repo, branch, file_path))
+
+    async def default_branch(self, repo):
+        """Branch di default del repository dalla cache, altrimenti dalla API del repository."""
+        if repo not in self.branches:
+            info = await self.query(method="GET",url=f"{self.api_url}/repos/{repo}",payload={})
+            if not info.get('state') or not isinstance(info.get('content'), dict):
+                return None
+            self.branches[repo] = info['content'].get('default_branch')
+        return self.branches[repo]
+
+    def forget(self, repo, branch, file_path):
+        """Invalida sha e contenuto del file; anche la voce del branch di default, che potrebbe coincidere."""
+        for ref in {branch, None}:
+            self.shas.pop((repo, ref, file_path), None)
+            self.contents.pop((repo, ref, file_path), None)
+
+    def cache(self, key, etag, file):
+        self.contents[key] = {'etag': etag, 'file': file}
+        self.contents.move_to_end(key)
+        while len(self.contents) > self.limit:
+            self.contents.popitem(last=False)
+
+    async def submit(self, method, constants, payload):
+        """
+        Scrittura sul contents API con lo sha in cache; se GitHub lo rifiuta come obsoleto (409/422)
+        lo sha viene riletto e la scrittura ritentata una volta.
+        """
+        repo, file_path, branch = constants['repo'], constants['file_path'], constants.get('branch')
+        url = f"{self.api_url}/repos/{repo}/contents/{file_path}"
+        if branch:
+            payload = payload | {"branch": branch}
+        result = None
+        for attempt in range(2):
+            if 'sha' in payload or method == 'DELETE':
+                sha = await self.sha(repo, file_path, branch)
+                if not sha and method == 'DELETE':
+                    return {"state": False, "remark": f"File not found: {file_path}"}
+                payload = payload | {"sha": sha}
+            result = await self.query(method=method,url=url,payload=payload)
+            if result.get('status') not in (409, 422) or 'sha' not in payload:
+                break
+            self.forget(repo, branch, file_path)
+        return result
     
     async def query(self, **constants):
         """
@@ -90,8 +181,7 @@ class adapter(persistence.port):
         url = constants.get('url','')
         payload = constants.get('payload','')
         method = constants.get('method','')
-        await self.refresh_token()  # Verifica e rinnova il token se necessario
-        self.access_token = await self.get_access_token()
+        access_token = await self.installation_token()  # Token in cache, rinnovato solo in scadenza
         '''async with aiohttp.ClientSession() as session:
             headers = {
                 "Authorization": f"token {self.access_token}",
@@ -107,24 +197,22 @@ class adapter(persistence.port):
                 else:
                     return {"state": False, "remark": f"Failed to read file: {response.status}"}'''
         
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"token {self.access_token}",
-                "Accept": "application/vnd.github+json",
-            }
-
-            async with session.request(method=method, url=url, headers=headers, json=payload) as response:
-                if response.status in [200, 201]:
-                    data = await response.json()
-                    match method:
-                        case 'GET':
-                            # Decode the content (base64)
-                            content = base64.b64decode(data['content']).decode('utf-8')
-                            return {"state": True, "content": data}
-                        case _:
-                            return {"state": True, "content": data}
-                else:
-                    return {"state": False, "remark": f"Request failed with status {response.status}"}
+        session = await self.connect()
+        headers = {
+            "Authorization": f"token {access_token}",
+            "Accept": "application/vnd.github+json",
+        } | constants.get('headers', {})
+
+        async with session.request(method=method, url=url, headers=headers, json=payload or None) as response:
+            if response.status == 304:
+                # Non modificato: il chiamante usa la propria copia (le 304 non consumano rate limit)
+                return {"state": True, "content": None, "status": 304}
+            if response.status in [200, 201]:
+                data = await response.json()
+                # Il contenuto resta in base64: la decodifica spetta a chi lo usa
+                return {"state": True, "content": data, "etag": response.headers.get('ETag')}
+            else:
+                return {"state": False, "remark": f"Request failed with status {response.status}", "status": response.status}
 
     async def create(self, *services, **constants):
         """
@@ -134,12 +222,12 @@ class adapter(persistence.port):
         if 'repo' not in constants or 'file_path' not in constants or 'content' not in constants:
             return {"state": False, "remark": "Repository, file_path, and content are required to create a resource."}
         
-        url = f"{self.api_url}/repos/{constants['repo']}/contents/{constants['file_path']}"
         payload = {
             "message": "Creating new file",
             "content": base64.b64encode(constants['content'].encode()).decode()  # Content should be base64-encoded
         }
-        a = await self.query(method="PUT",url=url,payload=payload)
+        a = await self.submit("PUT", constants, payload)
+        self.remember(constants['repo'], constants['file_path'], a, constants.get('branch'))
         return a
 
     async def delete(self, *services, **constants):
@@ -149,15 +237,13 @@ class adapter(persistence.port):
         if 'repo' not in constants or 'file_path' not in constants:
             return {"state": False, "remark": "Repository and file_path are required to delete a resource."}
 
-        file = await self.read(**constants)
-        sha = file['content']["sha"]
         # Now delete the file
-        url = f"{self.api_url}/repos/{constants['repo']}/contents/{constants['file_path']}"
         payload = {
             "message": "Deleting file",
-            "sha": sha
         }
-        return await self.query(method="DELETE",url=url,payload=payload)
+        result = await self.submit("DELETE", constants, payload)
+        self.forget(constants['repo'], constants.get('branch'), constants['file_path'])
+        return result
 
     async def read(self, *services, **constants):
         """
@@ -166,8 +252,21 @@ class adapter(persistence.port):
         if 'repo' not in constants or 'file_path' not in constants:
             return {"state": False, "remark": "Repository and file_path are required to read a resource."}
 
-        url = f"{self.api_url}/repos/{constants['repo']}/contents/{constants['file_path']}"
-        return await self.query(method="GET",url=url,payload={})  
+        # Read condizionale: con l'ETag in cache GitHub risponde 304 e si riusa la copia locale
+        branch = constants.get('branch')
+        key = (constants['repo'], branch, constants['file_path'])
+        cached = self.contents.get(key)
+        headers = {"If-None-Match": cached['etag']} if cached else {}
+        url = f"{self.api_url}/repos/{constants['repo']}/contents/{constants['file_path']}" + (f"?ref={branch}" if branch else "")
+        file = await self.query(method="GET",url=url,payload={},headers=headers)
+        if file.get('status') == 304 and cached:
+            self.contents.move_to_end(key)
+            return cached['file']
+        if file.get('state') and isinstance(file.get('content'), dict) and 'sha' in file['content']:
+            self.shas[key] = file['content']['sha']
+            if file.get('etag'):
+                self.cache(key, file['etag'], file)
+        return file
 
     async def update(self, *services, **constants):
         """
@@ -177,47 +276,128 @@ class adapter(persistence.port):
         if 'repo' not in constants or 'file_path' not in constants or 'content' not in constants:
             return {"state": False, "remark": "Repository, file_path, and content are required to write a resource."}
 
-        file = await self.read(**constants)
-        sha = file['content']["sha"]
-
-        # Update the file
-        url = f"{self.api_url}/repos/{constants['repo']}/contents/{constants['file_path']}"
+        # Update the file (lo sha viene dalla cache, riletto se obsoleto)
         payload = {
             "message": "Updating file",
             "content": base64.b64encode(constants['content'].encode()).decode(),
-            "sha": sha
+            "sha": None
         }
-        return await self.query(method="PUT",url=url,payload=payload)
+        result = await self.submit("PUT", constants, payload)
+        self.remember(constants['repo'], constants['file_path'], result, constants.get('branch'))
+        return result
+
+    async def commit(self, *services, **constants):
+        """
+        Commit di più file con la Git Data API: blob creati in parallelo, un solo tree,
+        un solo commit e un solo aggiornamento del ref.
+        'files' è una lista di {'file_path', 'content'}; content None cancella il file.
+        """
+        if 'repo' not in constants or not constants.get('files'):
+            return {"state": False, "remark": "Repository and files are required to commit."}
+
+        repo = constants['repo']
+        branch = constants.get('branch') or await self.default_branch(repo)
+        if not branch:
+            return {"state": False, "remark": f"Failed to get the default branch of {repo}"}
+        files = constants['files']
+        git = f"{self.api_url}/repos/{repo}/git"
+
+        ref = await self.query(method="GET",url=f"{git}/ref/heads/{branch}",payload={})
+        if not ref.get('state'):
+            return {"state": False, "remark": f"Failed to get ref heads/{branch}: {ref.get('remark')}"}
+        head = ref['content']['object']['sha']
+        parent = await self.query(method="GET",url=f"{git}/commits/{head}",payload={})
+        if not parent.get('state'):
+            return {"state": False, "remark": f"Failed to get commit {head}: {parent.get('remark')}"}
+
+        written = [file for file in files if file.get('content') is not None]
+        blobs = await asyncio.gather(*[self.query(method="POST",url=f"{git}/blobs",payload={
+            "content": base64.b64encode(file['content'].encode()).decode(),
+            "encoding": "base64",
+        }) for file in written])
+        for file, blob in zip(written, blobs):
+            if not blob.get('state'):
+                return {"state": False, "remark": f"Failed to create blob for {file['file_path']}: {blob.get('remark')}"}
+
+        tree = [{"path": file['file_path'], "mode": "100644", "type": "blob", "sha": blob['content']['sha']} for file, blob in zip(written, blobs)]
+        tree += [{"path": file['file_path'], "mode": "100644", "type": "blob", "sha": None} for file in files if file.get('content') is None]
+        created = await self.query(method="POST",url=f"{git}/trees",payload={"base_tree": parent['content']['tree']['sha'], "tree": tree})
+        if not created.get('state'):
+            return {"state": False, "remark": f"Failed to create tree: {created.get('remark')}"}
+
+        commit = await self.query(method="POST",url=f"{git}/commits",payload={
+            "message": constants.get('message', f"Updating {len(files)} files"),
+            "tree": created['content']['sha'],
+            "parents": [head],
+        })
+        if not commit.get('state'):
+            return {"state": False, "remark": f"Failed to create commit: {commit.get('remark')}"}
+
+        updated = await self.query(method="PATCH",url=f"{git}/refs/heads/{branch}",payload={"sha": commit['content']['sha']})
+        if not updated.get('state'):
+            return {"state": False, "remark": f"Failed to update ref heads/{branch}: {updated.get('remark')}"}
+
+        for file in files:
+            self.forget(repo, branch, file['file_path'])
+        for file, blob in zip(written, blobs):
+            self.shas[(repo, branch, file['file_path'])] = blob['content']['sha']
+        return {"state": True, "content": commit['content']}
+
+    async def batch(self, *services, **constants):
+        """Scritture multiple: un commit per repository invece di un commit per file."""
+        items = constants.get('items', [])
+        if constants.get('operation') not in ('create', 'update') or any('repo' not in item or 'file_path' not in item for item in items):
+            return await super().batch(*services, **constants)
+
+        repos = {}
+        for index, item in enumerate(items):
+            repos.setdefault((item['repo'], item.get('branch')), []).append(index)
+        results = [None] * len(items)
+        for (repo, branch), indexes in repos.items():
+            outcome = await self.commit(repo=repo, branch=branch, files=[items[index] for index in indexes])
+            for index in indexes:
+                results[index] = outcome
+        return {"state": all(result.get('state') for result in results), "result": results}
+
+    def remember(self, repo, file_path, result, branch=None):
+        """Aggiorna la cache degli sha dalla risposta di una scrittura sul contents API."""
+        self.forget(repo, branch, file_path)
+        content = (result or {}).get('content')
+        if result and result.get('state') and isinstance(content, dict) and isinstance(content.get('content'), dict):
+            self.shas[(repo, branch, file_path)] = content['content'].get('sha')
             
 
     async def view(self, repo, branch):
         """
         Ottieni l'albero di una repository specifica.
         """
-        self.access_token = await self.get_access_token()
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"token {self.access_token}",
-                "Accept": "application/vnd.github+json",
-            }
-
-            # Ottieni lo SHA del branch
-            branch_url = f"{self.api_url}/repos/{repo}/branches/{branch}"
-            async with session.get(branch_url, headers=headers) as branch_response:
-                if branch_response.status != 200:
-                    return {"state": False, "remark": "Failed to get branch details"}
-                
-                branch_data = await branch_response.json()
-                tree_sha = branch_data["commit"]["commit"]["tree"]["sha"]
+        access_token = await self.installation_token()
+        session = await self.connect()
+        headers = {
+            "Authorization": f"token {access_token}",
+            "Accept": "application/vnd.github+json",
+        }
 
-            # Ottieni la struttura dell'albero
-            tree_url = f"{self.api_url}/repos/{repo}/git/trees/{tree_sha}?recursive=1"
-            async with session.get(tree_url, headers=headers) as tree_response:
-                if tree_response.status != 200:
-                    return {"state": False, "remark": "Failed to get repository tree"}
-                
-                tree_data = await tree_response.json()
-                return {"state": True, "tree": self.build_tree_dict(tree_data["tree"])}
+        # Ottieni lo SHA del branch
+        branch_url = f"{self.api_url}/repos/{repo}/branches/{branch}"
+        async with session.get(branch_url, headers=headers) as branch_response:
+            if branch_response.status != 200:
+                return {"state": False, "remark": "Failed to get branch details"}
+            
+            branch_data = await branch_response.json()
+            tree_sha = branch_data["commit"]["commit"]["tree"]["sha"]
+
+        # Ottieni la struttura dell'albero
+        tree_url = f"{self.api_url}/repos/{repo}/git/trees/{tree_sha}?recursive=1"
+        async with session.get(tree_url, headers=headers) as tree_response:
+            if tree_response.status != 200:
+                return {"state": False, "remark": "Failed to get repository tree"}
+            
+            tree_data = await tree_response.json()
+            for item in tree_data["tree"]:
+                if item["type"] == "blob":
+                    self.shas[(repo, branch, item["path"])] = item["sha"]
+            return {"state": True, "tree": self.build_tree_dict(tree_data["tree"])}
 
     def build_tree_dict(self, tree):
         """
@@ -1,49 +1,100 @@
 import redis.asyncio as r
 import framework.port.persistence as persistence
 import json
+import framework.service.serializer as serializer
 import framework.service.flow as flow
 
+# Tipo e valore di più chiavi in un solo round-trip
+FETCH = """
+local out = {}
+for i, key in ipairs(KEYS) do
+    local kind = redis.call('TYPE', key)['ok']
+    local value = false
+    if kind == 'string' then value = redis.call('GET', key)
+    elseif kind == 'hash' then value = redis.call('HGETALL', key)
+    elseif kind == 'list' then value = redis.call('LRANGE', key, 0, -1)
+    elseif kind == 'set' then value = redis.call('SMEMBERS', key) end
+    out[i] = {kind, value}
+end
+return out
+"""
+
+def decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
 class adapter(persistence.port):
     conn = None
     engine = None
     def __init__(self,**constants):
         self.config = constants['config'] 
-        self.conn = r.from_url(f"redis://{self.config['host']}:{self.config['port']}")
+        options = dict()
+        # RESP3 e client-side caching opzionali (il caching richiede RESP3 e un client che lo supporti)
+        if int(self.config.get('protocol', 2)) == 3:
+            options['protocol'] = 3
+            if self.config.get('client_cache'):
+                try:
+                    from redis.cache import CacheConfig
+                    options['cache_config'] = CacheConfig(max_size=int(self.config.get('client_cache_size', 10000)))
+                except ImportError:
+                    print("Client-side caching non disponibile in questa versione di redis-py")
+        try:
+            self.conn = r.from_url(f"redis://{self.config['host']}:{self.config['port']}", **options)
+        except Exception as e:
+            print(f"Opzioni redis non supportate ({e}), uso la connessione standard")
+            self.conn = r.from_url(f"redis://{self.config['host']}:{self.config['port']}")
+        self.fetch = self.conn.register_script(FETCH)
+        # Codec dei valori stringa ('json', 'orjson', 'msgpack', con suffisso '+zlib' per la compressione)
+        self.serializer = self.config.get('serializer', 'json')
     
     async def query(self, *services, **constants):
         pass
 
+    async def read_many(self, identifiers, kind=None):
+        """
+        Legge più chiavi in un round-trip: MGET se sono tutte stringhe ('kind'='string'),
+        altrimenti uno script che rileva il tipo e recupera il valore di ogni chiave.
+        Restituisce identificativo -> (tipo, valore decodificato); le stringhe passano dal serializer,
+        le chiavi assenti hanno tipo 'none'.
+        """
+        identifiers = list(identifiers)
+        if not identifiers:
+            return {}
+        if kind == 'string':
+            values = await self.conn.mget(identifiers)
+            return {identifier: ('string', serializer.decode(value)) if value is not None else ('none', None) for identifier, value in zip(identifiers, values)}
+
+        out = dict()
+        for identifier, (typ, value) in zip(identifiers, await self.fetch(keys=identifiers)):
+            typ = decode(typ)
+            match typ:
+                case 'hash':
+                    # HGETALL arriva come lista piatta chiave, valore, ...
+                    pairs = value.items() if isinstance(value, dict) else zip(value[::2], value[1::2])
+                    out[identifier] = (typ, {decode(k): decode(v) for k, v in pairs})
+                case 'list' | 'set':
+                    out[identifier] = (typ, [decode(x) for x in value])
+                case 'string':
+                    out[identifier] = (typ, serializer.decode(value))
+                case _:
+                    out[identifier] = (typ, decode(value) if value else None)
+        return out
+
     @flow.asynchronous(ports=('storekeeper','messenger'))
     async def read(self, storekeeper, messenger, **constants):
         identifier = constants['identifier'] if 'identifier' in constants else 'test'
-        boolean = await self.conn.exists(identifier)
-        if boolean:
-            typ = await self.conn.type(identifier)
-            match typ.decode('ascii'):
-                case 'list':
-                    value = await self.conn.lrange(identifier, 0, -1)
-                    #return VARIABLE(worker,typ.decode('ascii'),identifier,[x.decode('ascii') for x in value])
-                    return None
-                case 'string':
-                    value = await self.conn.get(identifier)
-                    
-                    #return json.loads(value.decode('utf-8'))
-                    return storekeeper.builder('transaction',{'state': True,'action':'read','result':json.loads(value.decode('utf-8'))})
-                case 'set':
-                    await self.conn.sadd(identifier, value)
-                case 'dict':
-                    return await self.conn.mget(identifier)
-                case 'hash':
-                    value = await self.conn.hgetall(identifier)
-                    cov_dict = dict()
-
-                    for x in value: cov_dict[x.decode("utf-8")] = value[x].decode("utf-8")
-
-                    #return VARIABLE(worker,typ.decode('ascii'),identifier,{x.decode('ascii'):value[x].decode('ascii') for x in value})
-                    return cov_dict
-        else:
-            typ = await self.conn.type(identifier)
-            return storekeeper.builder('transaction',{'state': False,'action':'read','remark':'not found data'})
+        typ, value = (await self.read_many([identifier]))[identifier]
+        match typ:
+            case 'list':
+                #return VARIABLE(worker,typ.decode('ascii'),identifier,[x.decode('ascii') for x in value])
+                return None
+            case 'string':
+                #return json.loads(value.decode('utf-8'))
+                return storekeeper.builder('transaction',{'state': True,'action':'read','result':value})
+            case 'hash':
+                #return VARIABLE(worker,typ.decode('ascii'),identifier,{x.decode('ascii'):value[x].decode('ascii') for x in value})
+                return value
+            case 'none':
+                return storekeeper.builder('transaction',{'state': False,'action':'read','remark':'not found data'})
 
     @flow.asynchronous(ports=('storekeeper','messenger'))
     async def create(self, storekeeper, messenger, **constants):
@@ -69,14 +120,14 @@ class adapter(persistence.port):
                     try:
                         kwarg = dict()
                         if 'expiry' in self.config:kwarg['ex'] = int(self.config['expiry'])
-                        await self.conn.set(identifier, json.dumps(data),**kwarg)
+                        await self.conn.set(identifier, serializer.encode(data, self.serializer),**kwarg)
                     except Exception as e:
                         return storekeeper.builder('transaction',{'state': False,'action':'create','remark':f"{e}"})
                 case 'hash':
                     await self.conn.hmset(identifier, data)
                 case _:
                     try:
-                        await self.conn.set(identifier, json.dumps(data))
+                        await self.conn.set(identifier, serializer.encode(data, self.serializer))
                     except Exception as e:
                         print("ERRORE TIPO",typee)
                         return storekeeper.builder('transaction',{'state': False,'action':'create','remark':f"{e}"})
@@ -127,6 +178,36 @@ class adapter(persistence.port):
                     except Exception as e:
                         return storekeeper.builder('transaction',{'state': False,'action':'delete','remark':f"{e}"})
 
+    async def batch(self, **constants):
+        # Scrittura bulk in pipeline: un solo round-trip per tutti gli elementi
+        operation = constants.get('operation','create')
+        items = constants.get('items',[])
+        kwarg = dict()
+        if 'expiry' in self.config:kwarg['ex'] = int(self.config['expiry'])
+        try:
+            async with self.conn.pipeline(transaction=False) as pipe:
+                for item in items:
+                    identifier = item['identifier'] if 'identifier' in item else '#'
+                    if operation == 'create':
+                        pipe.set(identifier, serializer.encode(item['value'], self.serializer), nx=True, **kwarg)
+                    else:
+                        # SET XX: l'aggiornamento non crea chiavi mancanti
+                        pipe.set(identifier, serializer.encode(item['value'], self.serializer), xx=True, **kwarg)
+                outcomes = await pipe.execute()
+        except Exception as e:
+            return {'state': False,'result':[{'state': False,'action':operation,'remark':f"{e}"} for item in items]}
+
+        results = []
+        for item,outcome in zip(items,outcomes):
+            identifier = item['identifier'] if 'identifier' in item else '#'
+            if outcome:
+                results.append({'state': True,'action':operation,'remark':f"identifier:{identifier} {operation}d"})
+            elif operation == 'create':
+                results.append({'state': False,'action':operation,'remark':f"this identifier:{identifier} already exists"})
+            else:
+                results.append({'state': False,'action':operation,'remark':f"this identifier:{identifier} not found"})
+        return {'state': all(result['state'] for result in results),'result':results}
+
     @flow.asynchronous(ports=('storekeeper',))
     async def write(self, storekeeper, **constants):
         identifier = constants['identifier']
@@ -13,97 +13,152 @@ import importlib
 #sqlacodegen 
 
 class adapter(port.port):
-    
-    omm = dict({})
 
     def __init__(self,**constants):
         self.config = constants['config']
-        self.engine = create_async_engine(f"mysql+asyncmy://{self.config['username']}:{self.config['password']}@{self.config['host']}/{self.config['name']}")
+        # Pool asincrono configurabile: dimensione, overflow, riciclo e verifica delle connessioni
+        self.engine = create_async_engine(
+            f"mysql+asyncmy://{self.config['username']}:{self.config['password']}@{self.config['host']}/{self.config['name']}",
+            pool_size=int(self.config.get('pool_size',5)),
+            max_overflow=int(self.config.get('max_overflow',10)),
+            pool_recycle=int(self.config.get('pool_recycle',1800)),
+            pool_pre_ping=bool(self.config.get('pool_pre_ping',True)),
+        )
         #self.conn = self.engine.connect()
         self.metadata = db.MetaData()
+        self.Base = declarative_base(metadata=self.metadata)
+        # Modelli compilati per nome e statement preparati per (modello, tipo)
+        self.omm = dict({})
+        self.statements = dict({})
         #self.Session = sessionmaker(self.engine, expire_on_commit=False, class_=AsyncSession)
         self.async_session = async_sessionmaker(self.engine, future=True, expire_on_commit=False)
         #self.Session = sessionmaker(bind=self.engine) 
         #self.session = self.Session()
 
     def build(self,table_name):
-        Base = declarative_base()
         repository = importlib.import_module(f"framework.repository.{table_name}", package=None)
-        columns = []
-
-        for key,attr in repository.scheme:
-            li = [key]
-            attributes = dict()
-            for a in attr:
-                match a:
-                    case 'Integer': li.append(db.Integer)
-                    case 'String': li.append(db.String)
-                    case 'DateTime': li.append(db.DateTime)
-                    case 'Float': li.append(db.Float)
-            
-            if 'primary_key' in attr:
-                attributes['primary_key'] = True
-                #columns.append(db.Column(*li,primary_key=True))
-            if 'nullable' in attr:
-                attributes['nullable'] = True
-                #columns.append(db.Column(*li,nullable=True))
-
-            columns.append(db.Column(*li,**attributes))
-
-        class model(Base):
-            __table__ = db.Table(repository.location[self.config['profile'].upper()], Base.metadata,*columns)
-
-        return model
+        location = repository.location[self.config['profile'].upper()]
+        table = self.metadata.tables.get(location)
 
-    async def query(self,**constants):
+        if table is None:
+            columns = []
+            for key,attr in repository.scheme:
+                li = [key]
+                attributes = dict()
+                for a in attr:
+                    match a:
+                        case 'Integer': li.append(db.Integer)
+                        case 'String': li.append(db.String)
+                        case 'DateTime': li.append(db.DateTime)
+                        case 'Float': li.append(db.Float)
+                
+                if 'primary_key' in attr:
+                    attributes['primary_key'] = True
+                    #columns.append(db.Column(*li,primary_key=True))
+                if 'nullable' in attr:
+                    attributes['nullable'] = True
+                    #columns.append(db.Column(*li,nullable=True))
 
-        if constants['model'] not in self.omm:
-            model = self.build(constants['model'])
-        else:
-            model = self.omm[constants['model']]
+                columns.append(db.Column(*li,**attributes))
+            table = db.Table(location, self.metadata, *columns)
+
+        return type(f"model_{table_name}", (self.Base,), {'__table__': table})
+
+    def model(self,name):
+        if name not in self.omm:
+            self.omm[name] = self.build(name)
+        return self.omm[name]
+
+    def statement(self,name,kind):
+        """Statement preparati una volta per modello: select per id e pagina per offset."""
+        key = (name,kind)
+        if key not in self.statements:
+            model = self.model(name)
+            match kind:
+                case 'id':
+                    self.statements[key] = select(model).where(model.id == db.bindparam('identifier'))
+                case 'page':
+                    self.statements[key] = select(model).offset(db.bindparam('offset',type_=db.Integer)).limit(db.bindparam('limit',type_=db.Integer))
+        return self.statements[key]
 
-        #print(constants)
+    def prepare(self,**constants):
+        """Restituisce (statement, parametri, modello); i casi comuni usano gli statement in cache."""
+        name = constants['model']
+        model = self.model(name)
 
-        page_number = int(constants['page']) if 'page' in constants else 1
+        # Paginazione per offset: page/row oppure il filtro 'pagination' (start = pagina, end = righe)
+        pagination = constants['filter'].get('pagination',{}) if isinstance(constants.get('filter'),dict) else {}
+        page_number = int(constants['page']) if 'page' in constants else int(pagination.get('start',1))
         #if int(constants['page']) != 0 else 1
-        items_per_page = int(constants['row']) if 'row' in constants else 5
+        items_per_page = int(constants['row']) if 'row' in constants else int(pagination.get('end',5))
         identifier = constants['id'] if 'id' in constants else None
         #identifier = int(''.join(filter(str.isdigit, identifier)))
-        #page_number = 2
-        #items_per_page = 10
-        print(page_number,items_per_page,(page_number-1) * items_per_page)
-        #(page_number-1) * items_per_page
 
+        # Paginazione keyset: order_by ('-campo' per decrescente) e after = ultima chiave letta
+        keyset = pagination | {key:constants[key] for key in ('order_by','after','key') if key in constants}
+        order_by = keyset.get('order_by')
+
+        # Proiezione: solo le colonne richieste presenti nel modello
+        table = model.__table__
+        columns = [table.c[field] for field in constants.get('fields') or [] if field in table.c]
+
+        if not columns and not order_by:
+            if identifier:
+                return self.statement(name,'id'),{'identifier':identifier},model
+            return self.statement(name,'page'),{'offset':(page_number-1) * items_per_page,'limit':items_per_page},model
+
+        selection = select(*columns) if columns else select(model)
         if identifier:
-            stmt = select(model).where(model.id == identifier)
+            stmt = selection.where(model.id == identifier)
+        elif order_by:
+            field,descending,key,cursor = port.keyset(keyset)
+            column = getattr(model,field)
+            # Spareggio sulla chiave univoca: le righe con lo stesso valore di order_by non vanno perse fra le pagine
+            unique = getattr(model,key) if key != field and hasattr(model,key) else None
+            direction = (lambda item: item.desc()) if descending else (lambda item: item.asc())
+            beyond = (lambda item,value: item < value) if descending else (lambda item,value: item > value)
+            stmt = selection.order_by(*[direction(item) for item in (column,unique) if item is not None])
+            if cursor is not None:
+                value,last = cursor
+                if unique is None or last is None:
+                    stmt = stmt.where(beyond(column,value))
+                else:
+                    stmt = stmt.where(db.or_(beyond(column,value),db.and_(column == value,beyond(unique,last))))
+            stmt = stmt.limit(int(pagination.get('end',items_per_page)))
         else:
-            stmt = select(model).offset((page_number-1) * items_per_page).limit(items_per_page)
+            stmt = selection.offset((page_number-1) * items_per_page).limit(items_per_page)
 
-        return stmt,model
+        return stmt,{},model
+
+    async def query(self,**constants):
+        stmt,parameters,model = self.prepare(**constants)
+        return (stmt.params(parameters) if parameters else stmt),model
     
     @flow.asyn(ports=('storekeeper',))
     async def read(self, storekeeper, **constants):
-        query,model = await self.query(**constants)
+        query,parameters,model = self.prepare(**constants)
+
+        # Materializzazione con i tipi nativi: 'rows' (lista di dict) o 'columns' (dict di liste, default)
+        # (per letture grandi si pagina con storekeeper.stream invece di materializzare tutto)
+        layout = constants.get('layout',self.config.get('layout','columns'))
 
-        out = []
-        
         async with self.engine.begin() as conn:
             #id = int("".join(ch for ch in constants['identifier'] if ch.isdigit()))
             #result = await conn.execute(select(model).where(model.id == id))
-            result = await conn.execute(query)
-            for x in result.all():
-                out.append({c: str(getattr(x, c)) for c in model.__table__.columns.keys()})
-        ggg = dict()
-
-        if len(out) > 1:
-            for x in out[0]:
-                ggg[x] = [] 
-                for y in out:
-                    ggg[x].append(y[x])
-        elif len(out) == 1:
-            ggg = out[0]
+            result = await conn.execute(query,parameters)
+            keys = list(result.keys())
+            rows = result.all()
+
+        if layout == 'rows':
+            out = [dict(zip(keys,x)) for x in rows]
+            ggg = out
+        elif len(rows) == 1:
+            out = rows
+            ggg = dict(zip(keys,rows[0]))
         else:
-            pass
+            # Forma colonnare in un solo passaggio: la trasposizione avviene in C con zip
+            out = rows
+            ggg = {key:list(values) for key,values in zip(keys,zip(*rows))} if rows else {}
 
         if len(out) != 0:
             return storekeeper.builder('transaction',{'state': True,'action':'read','result':ggg})
@@ -113,7 +168,7 @@ class adapter(port.port):
     @flow.asyn(ports=('storekeeper',))
     async def create(self, storekeeper, **constants):
         storekeeper = constants['storekeeper']
-        model = await self.query(**constants)
+        model = self.model(constants['model'])
 
         try:
             #a = self.session.execute(insert(model),[constants['value']])
@@ -130,7 +185,7 @@ class adapter(port.port):
     @flow.asyn(ports=('storekeeper',))
     async def delete(self, storekeeper, **constants):
         storekeeper = constants['storekeeper']
-        model = await self.query(**constants)
+        model = self.model(constants['model'])
 
         try:
             async with self.engine.begin() as conn:
@@ -142,8 +197,90 @@ class adapter(port.port):
             error = str(e.__dict__['orig'])
             return storekeeper.builder('transaction',{'state': False,'remark':f"{error}"})
 
+    async def batch(self,**constants):
+        # Scrittura bulk: un executemany per modello e insieme di colonne (insert, o update legato all'identificativo);
+        # gli aggiornamenti parziali con colonne diverse finiscono in gruppi distinti e non si azzerano a vicenda
+        operation = constants.get('operation','create')
+        groups = dict()
+        for index,item in enumerate(constants.get('items',[])):
+            groups.setdefault((item['model'],tuple(sorted(item['value'].keys()))),[]).append((index,item))
+
+        results = [None] * len(constants.get('items',[]))
+        for (name,keys),group in groups.items():
+            model = self.model(name)
+            try:
+                async with self.engine.begin() as conn:
+                    if operation == 'create':
+                        await conn.execute(insert(model),[item['value'] for _,item in group])
+                    elif operation == 'update':
+                        stmt = update(model).where(model.id == db.bindparam('b_identifier')).values({key:db.bindparam(f"b_{key}") for key in keys})
+                        rows = []
+                        for _,item in group:
+                            row = {f"b_{key}":item['value'][key] for key in keys}
+                            row['b_identifier'] = int("".join(ch for ch in str(item['identifier']) if ch.isdigit()))
+                            rows.append(row)
+                        await conn.execute(stmt,rows)
+                    else:
+                        raise ValueError(f"operation {operation} not supported in batch")
+                for index,item in group:
+                    results[index] = {'state': True,'action':operation,'remark':f"identifier:{item.get('identifier')} {operation}d"}
+            except (SQLAlchemyError,ValueError) as e:
+                for index,item in group:
+                    results[index] = {'state': False,'action':operation,'remark':f"{e}"}
+
+        return {'state': all(result['state'] for result in results),'result':results}
+
+    # Operatori dei filtri traducibili in SQL (stessi nomi del filtro dei repository)
+    operators = {
+        'eq': lambda column,value: column == value,
+        'neq': lambda column,value: column != value,
+        'gt': lambda column,value: column > value,
+        'gte': lambda column,value: column >= value,
+        'lt': lambda column,value: column < value,
+        'lte': lambda column,value: column <= value,
+        'in': lambda column,value: column.in_(value if isinstance(value,(list,tuple)) else [value]),
+        'like': lambda column,value: column.like(value),
+        'ilike': lambda column,value: column.ilike(value),
+    }
+
+    async def aggregate(self,**constants):
+        # Aggregazione nativa: GROUP BY con count/sum/min/max etichettati come 'funzione_campo'
+        model = self.model(constants['model'])
+        table = model.__table__
+        functions = constants.get('functions',{'count':['*']})
+        group_by = [table.c[field] for field in constants.get('group_by',[])]
+        columns = list(group_by)
+        for function,fields in functions.items():
+            for field in fields:
+                if function not in ('count','sum','min','max'):
+                    return {'state': False,'action':'aggregate','remark':f"function {function} not supported"}
+                if field in ('*',None):
+                    columns.append(getattr(db.func,function)().label(function))
+                else:
+                    columns.append(getattr(db.func,function)(table.c[field]).label(f"{function}_{field}"))
+
+        stmt = select(*columns)
+        filter = constants.get('filter',{}) if isinstance(constants.get('filter'),dict) else {}
+        for op,params in filter.items():
+            if op == 'pagination':
+                continue
+            if op not in self.operators or not isinstance(params,dict) or any(field not in table.c for field in params):
+                # Filtro non traducibile: meglio fallire (e aggregare in memoria) che contare righe sbagliate
+                return {'state': False,'action':'aggregate','remark':f"filter {op} not supported"}
+            for field,value in params.items():
+                stmt = stmt.where(self.operators[op](table.c[field],value))
+        if group_by:
+            stmt = stmt.group_by(*group_by)
+
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(stmt)
+                return {'state': True,'action':'aggregate','result':[dict(row._mapping) for row in result.all()]}
+        except SQLAlchemyError as e:
+            return {'state': False,'action':'aggregate','remark':f"{e}"}
+
     async def write(self,**constants):
-        model = await self.query(**constants)
+        model = self.model(constants['model'])
 
         try:
             async with self.engine.begin() as conn:
@@ -1,6 +1,8 @@
 import sys
 import json
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 # Determina l'ambiente di esecuzione (backend o frontend con Pyodide)
 SUPABASE_ENV = os.environ.get('SUPABASE_ENV', 'BACKEND')
@@ -26,6 +28,7 @@ else:
 # Aggiusta il percorso del modulo se necessario, come nel tuo codice originale
 resources = {
     'flow': 'framework/service/flow.py',
+    'persistence': 'framework/port/persistence.py',
 }
 
 class adapter:
@@ -55,6 +58,12 @@ class adapter:
             self.client: Client = create_client(self.config['url'], self.config['key'])
             print("✅ Supabase initialized for Backend!")
 
+        # Il client backend è sincrono: le chiamate girano su un pool di thread dedicato e limitato,
+        # così il loop (e uvicorn) non si blocca; il client e il suo pool HTTP sono condivisi fra i thread
+        self.concurrency = int(self.config.get('concurrency', 8))
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.executor = None if self.is_frontend else ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='supabase')
+
         self.set_token(self.config.get('token', ''),self.config.get('token', ''))
 
     def set_token(self, token,token2):
@@ -71,7 +80,20 @@ class adapter:
             return query
         
         for op, params in filters.items():
-            if op == 'pagination':
+            if op == 'pagination' and ('after' in params or 'order_by' in params):
+                # Keyset: filtra oltre l'ultima chiave letta, il costo non cresce con la profondità della pagina
+                field, descending, key, cursor = persistence.keyset(params)
+                condition = self._keyset_condition(field, descending, key, cursor)
+                if isinstance(condition, str):
+                    query = query.or_(condition)
+                elif condition:
+                    query = getattr(query, condition[0])(field, condition[1])
+                query = query.order(field, desc=descending)
+                if key != field:
+                    # Spareggio sulla chiave univoca: nessuna riga persa fra una pagina e l'altra
+                    query = query.order(key, desc=descending)
+                query = query.limit(params.get('end', 10))
+            elif op == 'pagination':
                 start = params.get('start', 1)
                 end = params.get('end', 10)
                 start_index, end_index = (start - 1) * end, start * end - 1
@@ -84,29 +106,68 @@ class adapter:
                     query = getattr(query, op)(field, value)
         return query
 
+    @staticmethod
+    def _keyset_condition(field, descending, key, cursor):
+        """
+        Condizione keyset oltre il cursore: (operatore, valore) se basta order_by,
+        altrimenti l'espressione PostgREST 'or' su (order_by, chiave).
+        """
+        if cursor is None:
+            return None
+        op = 'lt' if descending else 'gt'
+        value, last = cursor
+        if last is None or key == field:
+            return (op, value)
+        def quote(item):
+            return '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return f"{field}.{op}.{quote(value)},and({field}.eq.{quote(value)},{key}.{op}.{quote(last)})"
+
     async def query(self, **constants):
         """Esegue una query su Supabase in base all'ambiente."""
         payload = constants.get('payload', {})
         method = constants.get('method', '').upper()
         location = constants.get('location', '')
         filters = constants.get('filter', {})
+        # Proiezione: solo le colonne richieste invece di select('*')
+        columns = ','.join(constants.get('fields') or []) or '*'
 
         if not location:
             return {"state": False, "error": "Location not specified."}
         
         if self.is_frontend:
-            return await self._query_frontend(method, location, payload, filters)
+            return await self._query_frontend(method, location, payload, filters, columns)
         else:
-            return self._query_backend(method, location, payload, filters)
+            return await self._offload(self._query_backend, method, location, payload, filters, columns)
+
+    async def _offload(self, function, *args):
+        """Esegue una chiamata sincrona del client nel pool di thread, entro il limite di concorrenza."""
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
 
-    async def _query_frontend(self, method, location, payload, filters):
+    async def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def _query_frontend(self, method, location, payload, filters, columns='*'):
         """Logica di query per Pyodide (frontend) usando JS."""
         
         # Semplificazione della gestione dei filtri per JS
         filter_code = ""
         if filters:
             for op, params in filters.items():
-                if op == 'pagination':
+                if op == 'pagination' and ('after' in params or 'order_by' in params):
+                    field, descending, key, cursor = persistence.keyset(params)
+                    condition = self._keyset_condition(field, descending, key, cursor)
+                    if isinstance(condition, str):
+                        filter_code += f".or({json.dumps(condition)})"
+                    elif condition:
+                        filter_code += f".{condition[0]}('{field}', {json.dumps(condition[1])})"
+                    filter_code += f".order('{field}', {{ ascending: {'false' if descending else 'true'} }})"
+                    if key != field:
+                        filter_code += f".order('{key}', {{ ascending: {'false' if descending else 'true'} }})"
+                    filter_code += f".limit({int(params.get('end', 10))})"
+                elif op == 'pagination':
                     start = params.get('start', 1)
                     end = params.get('end', 10)
                     start_index, end_index = (start - 1) * end, start * end - 1
@@ -127,7 +188,7 @@ class adapter:
 
             switch ("{method}") {{
                 case "GET":
-                    query = query.select("*"){filter_code};
+                    query = query.select({json.dumps(columns)}){filter_code};
                     response = await query;
                     break;
                 case "POST":
@@ -173,14 +234,14 @@ class adapter:
         except Exception as e:
             return {"state": False, "error": f"JS execution error: {str(e)}"}
 
-    def _query_backend(self, method, location, payload, filters):
+    def _query_backend(self, method, location, payload, filters, columns='*'):
         """Logica di query per il backend usando la libreria Python."""
         try:
             query = self.client.table(location)
             response = None
             
             if method == 'GET':
-                query = self._apply_filters_to_query(query.select('*'), filters)
+                query = self._apply_filters_to_query(query.select(columns), filters)
                 response = query.execute()
 
             elif method == 'PUT':
@@ -212,6 +273,101 @@ class adapter:
         except Exception as e:
             return {"state": False, "error": str(e)}
 
+    def _batch_backend(self, operation, location, items):
+        """
+        Scrittura bulk: una insert con la lista dei payload; per gli update una update per payload distinto,
+        con 'in' sul campo di match quando è uno solo (un update non crea mai righe).
+        """
+        query = self.client.table(location)
+        if operation == 'create':
+            rows = query.insert([item.get('payload', {}) for item in items]).execute().data or []
+            if len(rows) != len(items):
+                # Senza una riga per elemento non si può attribuire il risultato
+                return [{"state": True, "result": []} for item in items]
+            return [{"state": True, "result": [row]} for row in rows]
+
+        results = [None] * len(items)
+        groups = {}
+        for index, item in enumerate(items):
+            match = item.get('filter', {}).get('eq', {})
+            if not match:
+                raise ValueError("Gli update bulk richiedono un filtro 'eq' per ogni elemento.")
+            payload = item.get('payload', {})
+            key = (json.dumps(payload, sort_keys=True, default=str), tuple(sorted(match)))
+            groups.setdefault(key, []).append(index)
+
+        for (_, fields), indexes in groups.items():
+            payload = items[indexes[0]].get('payload', {})
+            if len(fields) == 1:
+                field = fields[0]
+                values = [items[index]['filter']['eq'][field] for index in indexes]
+                rows = self.client.table(location).update(payload).in_(field, values).execute().data or []
+                for index, value in zip(indexes, values):
+                    results[index] = {"state": True, "result": [row for row in rows if str(row.get(field)) == str(value)]}
+            else:
+                for index in indexes:
+                    query = self.client.table(location).update(payload)
+                    for field, value in items[index]['filter']['eq'].items():
+                        query = query.eq(field, value)
+                    results[index] = {"state": True, "result": query.execute().data or []}
+        return results
+
+    async def batch(self, **constants):
+        """Raggruppa gli elementi per location ed esegue una sola chiamata bulk per gruppo."""
+        operation = constants.get('operation', 'create')
+        items = constants.get('items', [])
+        results = [None] * len(items)
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(item.get('location', ''), []).append(index)
+
+        # Senza chiamata bulk (frontend o operazioni diverse da create/update) si procede per elemento
+        bulk = not self.is_frontend and operation in ('create', 'update')
+        method = {'create': self.create, 'update': self.update, 'delete': self.delete}.get(operation, self.read)
+        for location, indexes in groups.items():
+            group = [items[index] for index in indexes]
+            outcomes = None
+            if bulk:
+                try:
+                    outcomes = await self._offload(self._batch_backend, operation, location, group)
+                except Exception as e:
+                    print(f"Batch non disponibile per {location}, procedo per elemento: {e}")
+            if outcomes is None:
+                # Fallback: una chiamata per elemento, in parallelo
+                outcomes = await asyncio.gather(*[method(**item) for item in group])
+            for index, outcome in zip(indexes, outcomes):
+                results[index] = outcome
+        return {"state": all(result and result.get('state') for result in results), "result": results}
+
+    def _aggregate_backend(self, location, functions, group_by, filters):
+        """Aggregazione nativa PostgREST: colonne di raggruppamento più funzioni con alias, es. 'sum_amount:amount.sum()'."""
+        columns = list(group_by)
+        for function, fields in functions.items():
+            for field in fields:
+                if field in ('*', None):
+                    columns.append(f"{function}:{function}()")
+                else:
+                    columns.append(f"{function}_{field}:{field}.{function}()")
+        query = self._apply_filters_to_query(self.client.table(location).select(','.join(columns)), filters)
+        response = query.execute()
+        return {"state": True, "result": response.data or []}
+
+    async def aggregate(self, **constants):
+        """Count/sum/min/max lato server; se gli aggregati PostgREST non sono abilitati si aggrega in memoria."""
+        functions = constants.get('functions', {'count': ['*']})
+        group_by = constants.get('group_by', [])
+        location = constants.get('location', '')
+        filters = {op: params for op, params in (constants.get('filter') or {}).items() if op != 'pagination'}
+        if not self.is_frontend:
+            try:
+                return await self._offload(self._aggregate_backend, location, functions, group_by, filters)
+            except Exception as e:
+                print(f"Aggregazione nativa non disponibile per {location}: {e}")
+        transaction = await self.query(**constants | {'method': 'GET', 'filter': filters})
+        if not transaction.get('state'):
+            return transaction
+        return {"state": True, "result": persistence.summarize(transaction.get('result') or [], functions, group_by)}
+
     # Metodi di alias per le operazioni CRUD
     @flow.asynchronous(outputs='transaction')
     async def create(self, **constants):
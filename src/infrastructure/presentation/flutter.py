@@ -565,7 +565,7 @@ class adapter(presentation.port):
         fragment = urllib.parse.parse_qs(parsed.fragment)
         #print('URL:',path,query,fragment)
         
-        view = await self.builder(url=self.routes.get(path,{}).get('view'),path=path,query=query,fragment=fragment)
+        view = await self.builder(url=(self.match_route(path) or {}).get('view'),path=path,query=query,fragment=fragment)
         for vvv in window.views:
             if vvv.route == path: return vvv
         window.views.append(ft.View(path,[view],padding=0))
@@ -3,6 +3,7 @@ import asyncio
 from html import escape
 import re
 import json
+import hashlib
 from datetime import datetime
 from urllib.parse import urlparse, urlunparse, ParseResult,parse_qs
 
@@ -17,6 +18,7 @@ try:
     from starlette.requests import Request
     from starlette.responses import JSONResponse,HTMLResponse,RedirectResponse
     from starlette.routing import Route,Mount,WebSocketRoute
+    from starlette.convertors import CONVERTOR_TYPES, StringConvertor, register_url_convertor
     from starlette.middleware import Middleware
     from starlette.websockets import WebSocket
     from starlette.middleware.sessions import SessionMiddleware
@@ -29,6 +31,7 @@ try:
     import uuid
     #import uvicorn
     from uvicorn import Config, Server
+    from kink import di
 
     # Auth 
     #from starlette.middleware.sessions import SessionMiddleware
@@ -43,7 +46,7 @@ try:
     from starlette.datastructures import MutableHeaders
     import http.cookies
     import markupsafe
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, Tag
     import paramiko
     import asyncio
 
@@ -59,7 +62,7 @@ try:
 except Exception as e:
     #import starlette
     import markupsafe
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, Tag
     
     import xml.etree.ElementTree as ET
     from xml.sax.saxutils import escape
@@ -688,6 +691,13 @@ class adapter(presentation.port):
         self.initialize()
         self.views = dict({})
         self.ssh = {}
+        # Ultima versione HTML di ogni componente inviata a ciascun WebSocket
+        self.sockets = {}
+        # Componenti contenuti nell'ultima pagina renderizzata per ogni sessione (limitati alle più recenti)
+        self.pages = {}
+        self.retained = int(self.config.get('pages', 1024))
+        # Chiavi che un client può inviare con una richiesta di rebuild
+        self.rebuildable = frozenset(self.config.get('rebuildable', ('query', 'params')))
         cwd = os.getcwd()
 
         routes=[
@@ -715,7 +725,7 @@ class adapter(presentation.port):
                 resource_url = f"application/policy/presentation/{route_path}"
 
                 file = await self.fetch_resource(url=resource_url)
-                self.parse_route(file)
+                self.parse_route(file, cache=self.config.get('route_cache'))
                 self.mount_route(routes) # 'routes' deve essere accessibile qui
 
             except Exception as e:
@@ -724,7 +734,7 @@ class adapter(presentation.port):
                 # Considera di sollevare l'eccezione o terminare se l'app non può partire senza rotte
 
             # Inizializza l'applicazione Starlette con rotte e middleware
-            self.app = Starlette(debug=True, routes=routes, middleware=middleware)
+            self.app = Starlette(debug=True, routes=routes, middleware=middleware, on_shutdown=[self.shutdown])
 
             # Parametri di configurazione base per Uvicorn
             uvicorn_config_params = {
@@ -763,6 +773,16 @@ class adapter(presentation.port):
                 print(f"Errore critico durante l'avvio del server Uvicorn: {e}")
         loop.create_task(main())
     
+    async def shutdown(self):
+        """Alla chiusura del server chiude le sessioni HTTP condivise dei provider."""
+        for area in ('persistence','message','actuator'):
+            for provider in (di[area] if area in di else []):
+                if callable(getattr(provider,'close',None)):
+                    try:
+                        await provider.close()
+                    except Exception as e:
+                        print(f"Errore durante la chiusura di {provider}: {e}")
+
     async def mount_css(self,constants):
         pass
         
@@ -823,22 +843,114 @@ class adapter(presentation.port):
         #ws_queue = asyncio.Queue()  # Coda per i messaggi WebSocket
         #messenger_queue = asyncio.Queue()  # Coda per i messaggi di Messenger
         stop_event = asyncio.Event()  # Evento per fermare il loop quando necessario
+        # Il socket riceve le patch dei componenti della pagina che il client sta mostrando
+        # (la sessione è quella del cookie firmato: utenti dietro lo stesso NAT restano separati)
+        subscriber = websocket.scope.get('session', {}).get('subscriber')
+        self.sockets[websocket] = {id: None for id in self.pages.get(subscriber, [])} if subscriber else {}
 
         async def listen_websocket():
             try:
                 while not stop_event.is_set():
                     msg = await websocket.receive_text()
                     print(f"📥 Messaggio dal client: {msg}")
-                    await websocket.send_text(msg)
+                    try:
+                        request = json.loads(msg)
+                    except ValueError:
+                        request = None
+                    # {"action": "rebuild", "id": ..., "data": {...}} → patch del solo componente
+                    if isinstance(request, dict) and request.get('action') == 'rebuild':
+                        # Dal client solo chiavi ammesse: mai 'text', 'file' o 'component' verso il builder
+                        data = request.get('data') if isinstance(request.get('data'), dict) else {}
+                        data = {key: value for key, value in data.items() if key in self.rebuildable}
+                        await self.push(websocket, str(request.get('id', '')), **data)
+                    else:
+                        await websocket.send_text(msg)
             except Exception:
                 stop_event.set()  # Ferma il ciclo se il WebSocket si chiude
 
         async def listen_for_updates():
-            while not stop_event.is_set():
-                msg = await messenger.read(domain='*',identity=ip)
-                print(f"📨 Messaggio dal server: {msg}")
-                #await messenger_queue.put(msg)
-                await websocket.send_text(msg)
+            try:
+                while not stop_event.is_set():
+                    msg = await messenger.read(domain='*',identity=ip)
+                    print(f"📨 Messaggio dal server: {msg}")
+                    #await messenger_queue.put(msg)
+                    await websocket.send_text(msg)
+            except Exception:
+                stop_event.set()
+
+        tasks = [asyncio.create_task(listen_websocket()), asyncio.create_task(listen_for_updates())]
+        try:
+            await stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.sockets.pop(websocket, None)
+
+    async def rebuild(self, id, tag, **data):
+        """Ri-renderizza il componente e invia le patch a ogni WebSocket che lo sta mostrando."""
+        websockets = [socket for socket, sent in self.sockets.items() if id in sent]
+        if not websockets:
+            # Nessun client noto per il componente: percorso originale della porta
+            return await super().rebuild(id, tag, **data)
+        for websocket in websockets:
+            await self.push(websocket, id, **data)
+
+    async def push(self, websocket, id, **data):
+        """
+        Renderizza solo il sottoalbero del componente, lo confronta con l'ultima versione inviata
+        al client e trasmette le patch DOM minime ({"type": "patch", "id", "patches"}).
+        """
+        component = self.components.get(id)
+        if not component:
+            await websocket.send_text(json.dumps({'type': 'error', 'id': id, 'error': f"Componente '{id}' non trovato."}))
+            return
+
+        html = await self.builder(file=component.get('view', ''), component=component, **data)
+        html = self.set_attribute(str(html), 'id', id)
+
+        sent = self.sockets.setdefault(websocket, {})
+        previous = sent.get(id)
+        patches = self.diff(previous, html) if previous else [{'op': 'replace', 'path': [], 'html': html}]
+        sent[id] = html
+
+        if patches:
+            await websocket.send_text(json.dumps({'type': 'patch', 'id': id, 'patches': patches}))
+
+    def diff(self, old, new):
+        """
+        Confronta due frammenti HTML e restituisce le patch per trasformare il primo nel secondo.
+        I percorsi sono indici in childNodes a partire dalla radice del componente.
+        """
+        patches = []
+
+        def value(attribute):
+            return ' '.join(attribute) if isinstance(attribute, list) else attribute
+
+        def walk(a, b, path):
+            if not isinstance(a, Tag) or not isinstance(b, Tag) or a.name != b.name:
+                if not isinstance(a, Tag) and not isinstance(b, Tag):
+                    if str(a) != str(b):
+                        patches.append({'op': 'text', 'path': path, 'value': str(b)})
+                else:
+                    patches.append({'op': 'replace', 'path': path, 'html': str(b)})
+                return
+
+            for name in a.attrs.keys() - b.attrs.keys():
+                patches.append({'op': 'remove_attribute', 'path': path, 'name': name})
+            for name, attribute in b.attrs.items():
+                if value(a.attrs.get(name)) != value(attribute):
+                    patches.append({'op': 'attribute', 'path': path, 'name': name, 'value': value(attribute)})
+
+            old_children, new_children = list(a.children), list(b.children)
+            for index in range(min(len(old_children), len(new_children))):
+                walk(old_children[index], new_children[index], path + [index])
+            for child in new_children[len(old_children):]:
+                patches.append({'op': 'append', 'path': path, 'html': str(child)})
+            for index in reversed(range(len(new_children), len(old_children))):
+                patches.append({'op': 'remove', 'path': path + [index]})
+
+        walk(BeautifulSoup(old, 'html.parser').find(), BeautifulSoup(new, 'html.parser').find(), [])
+        return patches
     
     @flow.asynchronous(managers=('defender',))
     async def websocketssh(self, websocket, defender):
@@ -1011,40 +1123,7 @@ class adapter(presentation.port):
             return parsed._replace(**merged)
         parsed_url = process_url(url, self.url)   # self.url = base url
 
-        matched_route = None
-
-        for route_path, route_data in self.routes.items():
-            # costruiamo il pattern regex in modo sicuro:
-            parts = []
-            last_idx = 0
-            param_names = []
-
-            # trova tutte le {...} nel route_path
-            for m in re.finditer(r'\{([^}]+)\}', route_path):
-                # escape della parte statica prima della match
-                parts.append(re.escape(route_path[last_idx:m.start()]))
-                # gruppo di cattura per quel segmento
-                parts.append('([^/]+)')
-                # salva il nome del parametro, rimuovendo eventuale '$' iniziale
-                param_names.append(m.group(1).lstrip('$'))
-                last_idx = m.end()
-
-            # aggiungi la parte finale (escaped)
-            parts.append(re.escape(route_path[last_idx:]))
-            regex_pattern = '^' + ''.join(parts) + '$'
-
-            match = re.search(regex_pattern, parsed_url.path)
-            if match:
-                matched_route = {
-                    'view': route_data.get('view'),
-                    'params': {},
-                    'layout': route_data.get('layout')
-                }
-
-                for i, name in enumerate(param_names):
-                    matched_route['params'][name] = match.group(i + 1)
-
-                break  # prima corrispondenza -> esci
+        matched_route = self.match_route(parsed_url.path)
 
         if not matched_route:
             print(f"Nessuna rotta corrispondente per l'URL: {url}")
@@ -1078,7 +1157,16 @@ class adapter(presentation.port):
 
     async def starlette_view(self,request):
         request.session["url_precedente"] = str(request.url)
-        html = await self.mount_view(str(request.url))
+        token = presentation.mounted.set([])
+        try:
+            html = await self.mount_view(str(request.url))
+            subscriber = request.session.setdefault('subscriber', uuid.uuid4().hex)
+            self.pages.pop(subscriber, None)
+            self.pages[subscriber] = presentation.mounted.get()
+            while len(self.pages) > self.retained:
+                self.pages.pop(next(iter(self.pages)))
+        finally:
+            presentation.mounted.reset(token)
         print(html, "html_body**********************",str(request.url))
         '''layout = 'application/view/layout/base.html'
         file = await self.fetch_resource({'url':layout})
@@ -1468,11 +1556,31 @@ class adapter(presentation.port):
             await self.apply_style(widget, styles)'''
         pass
 
+    def starlette_path(self, path):
+        """
+        Converte un path della policy in un path Starlette: le alternative {a|b}
+        diventano un parametro con un convertitore dedicato invece di essere espanse.
+        """
+        segments = []
+        for index, segment in enumerate(path.split('/')):
+            # Le alternative possono stare anche dentro un segmento misto (es. x-{a|b})
+            count = iter(range(len(segment)))
+            def choice(options):
+                values = sorted(set(options.group(1).split('|')))
+                name = 'choice_' + hashlib.sha1('|'.join(values).encode('utf-8')).hexdigest()[:12]
+                if name not in CONVERTOR_TYPES:
+                    convertor = type(name, (StringConvertor,), {'regex': '(?:' + '|'.join(re.escape(v) for v in values) + ')'})
+                    register_url_convertor(name, convertor())
+                return f'{{_{index}_{next(count)}:{name}}}'
+            segments.append(re.sub(r'\{([a-zA-Z0-9_]+(?:\|[a-zA-Z0-9_]+)+)\}', choice, segment))
+        return '/'.join(segments)
+
     def mount_route(self, routes):
         for path, data in self.routes.items():
             typee = data.get('type')
             method = data.get('method')
             view = data.get('view')
+            path = self.starlette_path(path)
 
             # Associa il path alla view (utile per debug o reverse lookup)
             self.views[path] = view
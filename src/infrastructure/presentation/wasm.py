@@ -25,6 +25,40 @@ else:
           return req.response, None, None
 
 
+def node(root, path):
+    """Risolve un percorso di indici in childNodes a partire dalla radice del componente."""
+    for index in path:
+        root = root.childNodes[index]
+    return root
+
+def apply(root, patches, fragment):
+    """
+    Applica al DOM le patch prodotte dal diff del server (replace, text, attribute,
+    remove_attribute, append, remove); fragment(html) crea il nodo da inserire.
+    Restituisce la radice del componente, nuova se è stata sostituita.
+    """
+    for patch in patches:
+        op, path = patch.get('op'), patch.get('path', [])
+        target = node(root, path)
+        if op == 'replace':
+            element = fragment(patch.get('html', ''))
+            target.parentNode.replaceChild(element, target)
+            if not path:
+                root = element
+        elif op == 'text':
+            target.textContent = patch.get('value', '')
+        elif op == 'attribute':
+            target.setAttribute(patch.get('name'), patch.get('value', ''))
+        elif op == 'remove_attribute':
+            target.removeAttribute(patch.get('name'))
+        elif op == 'append':
+            target.appendChild(fragment(patch.get('html', '')))
+        elif op == 'remove':
+            target.parentNode.removeChild(target)
+        else:
+            print(f"Patch non supportata: {op}")
+    return root
+
 class adapter(starlette.adapter):
   if sys.platform != 'emscripten':
     async def view(self,request):
@@ -232,6 +266,9 @@ class adapter(starlette.adapter):
             print(msg,'BONDmsg')
             domains = msg.get('domain',[])
             print(constants,'BOND',domains,msg)
+            if msg.get('type') == 'patch':
+              self.patch(msg.get('id'),msg.get('patches',[]))
+              continue
             '''ok = []
             for x in self.data.keys():
                 
@@ -740,6 +777,20 @@ class adapter(starlette.adapter):
                         add_class(cls)
                        
 
+        def fragment(self, html):
+          template = self.document.createElement('template')
+          template.innerHTML = html.strip()
+          return template.content.firstChild
+
+        def patch(self, id, patches):
+          try:
+              component = self.document.getElementById(id)
+              if component is None:
+                  raise ValueError(f"Elemento con id '{id}' non trovato nel documento.")
+              apply(component, patches, self.fragment)
+          except Exception as e:
+              print(f"Errore durante l'applicazione delle patch al componente '{id}': {e}")
+
         async def rebuild(self, id, tag, **data):
           try:
               #url = f"application/view/component/{tag}.xml"
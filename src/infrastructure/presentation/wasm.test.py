@@ -3,12 +3,59 @@ import unittest
 import framework.port.persistence as persistence
 import framework.service.flow as flow
 import framework.service.language as language
-from infrastructure.presentation.wasm import adapter
+from infrastructure.presentation.wasm import adapter, apply
 
 from unittest import IsolatedAsyncioTestCase
 
+class element:
+    """Nodo DOM minimo: childNodes, attributi e testo."""
+    def __init__(self, tag, text='', children=None, **attributes):
+        self.tag, self.textContent, self.attributes = tag, text, attributes
+        self.childNodes, self.parentNode = [], None
+        for child in children or []:
+            self.appendChild(child)
+
+    def appendChild(self, child):
+        child.parentNode = self
+        self.childNodes.append(child)
+
+    def removeChild(self, child):
+        self.childNodes.remove(child)
+
+    def replaceChild(self, new, old):
+        new.parentNode = self
+        self.childNodes[self.childNodes.index(old)] = new
+
+    def setAttribute(self, name, value):
+        self.attributes[name] = value
+
+    def removeAttribute(self, name):
+        self.attributes.pop(name, None)
+
 class AdapterTest(IsolatedAsyncioTestCase):
     def __init__(self, *args,**kwargs):
         super(AdapterTest, self).__init__(*args, **kwargs)  # Chiamata al costruttore di unittest.TestCase
         config = {'adapter':"api",'url':"https://api.github.com",'token': ""}
-        self.test = adapter(config=config)  # Inizializza il tuo adapter qui
\ No newline at end of file
+        self.test = adapter(config=config)  # Inizializza il tuo adapter qui
+
+    def test_apply(self):
+        page = element('body', children=[element('div', id='c1', children=[element('span', 'uno'), element('b', 'due'), element('i', 'tre')])])
+        root = page.childNodes[0]
+        patches = [
+            {'op': 'text', 'path': [0], 'value': 'nuovo'},
+            {'op': 'attribute', 'path': [], 'name': 'class', 'value': 'active'},
+            {'op': 'remove_attribute', 'path': [], 'name': 'id'},
+            {'op': 'remove', 'path': [2]},
+            {'op': 'replace', 'path': [1], 'html': 'em'},
+            {'op': 'append', 'path': [], 'html': 'p'},
+        ]
+        result = apply(root, patches, lambda html: element(html))
+        self.assertIs(result, root)
+        self.assertEqual([child.tag for child in root.childNodes], ['span', 'em', 'p'])
+        self.assertEqual(root.childNodes[0].textContent, 'nuovo')
+        self.assertEqual(root.attributes, {'class': 'active'})
+
+        # La sostituzione della radice restituisce il nuovo nodo del componente
+        result = apply(root, [{'op': 'replace', 'path': [], 'html': 'section'}], lambda html: element(html))
+        self.assertEqual(result.tag, 'section')
+        self.assertIs(page.childNodes[0], result)